@@ -0,0 +1,21 @@
+from django.conf import settings
+
+
+def pragma_statements(pragmas):
+    """PRAGMA-команды для словаря {имя: значение}."""
+    return [f'PRAGMA {name} = {value}' for name, value in pragmas.items()]
+
+
+def configure_sqlite(sender, connection, **kwargs):
+    """Применяет SQLITE_PRAGMAS к каждому новому соединению SQLite.
+
+    journal_mode=WAL сохраняется в самом файле базы, остальные
+    настройки действуют только в пределах соединения, поэтому
+    выставляются на каждом; с CONN_MAX_AGE это случается редко.
+    """
+    if connection.vendor != 'sqlite':
+        return
+    pragmas = getattr(settings, 'SQLITE_PRAGMAS', {})
+    with connection.cursor() as cursor:
+        for statement in pragma_statements(pragmas):
+            cursor.execute(statement)
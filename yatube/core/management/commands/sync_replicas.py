@@ -0,0 +1,34 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+class Command(BaseCommand):
+    help = ('Копирует базу default в файлы реплик SQLite: локальная '
+            'замена репликации для проверки core.routers.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            'aliases', nargs='*',
+            help='Какие реплики обновить; по умолчанию - все, кроме default.'
+        )
+
+    def handle(self, *args, **options):
+        aliases = options['aliases'] or [
+            alias for alias in settings.DATABASES if alias != 'default'
+        ]
+        source = connections['default']
+        if source.vendor != 'sqlite':
+            raise CommandError('Копирование поддерживается только для SQLite')
+        source.ensure_connection()
+        for alias in aliases:
+            if alias not in settings.DATABASES:
+                raise CommandError(f'Нет базы {alias} в DATABASES')
+            target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+            try:
+                source.connection.backup(target)
+            finally:
+                target.close()
+            self.stdout.write(f'{alias} обновлена')
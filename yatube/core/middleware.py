@@ -0,0 +1,144 @@
+import logging
+import time
+from collections import Counter
+from contextlib import ExitStack
+
+from django.conf import settings
+from django.db import connections
+
+from . import routers
+
+logger = logging.getLogger('yatube.queries')
+
+
+class QueryBudgetExceeded(Exception):
+    pass
+
+
+class QueryStats:
+    """Запросы одного HTTP-запроса: число, время и повторы."""
+
+    def __init__(self):
+        self.count = 0
+        self.duration = 0.0
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        started = time.monotonic()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.duration += time.monotonic() - started
+            self.count += 1
+            self.statements[sql] += 1
+
+    @property
+    def duplicates(self):
+        """Повторы одного и того же SQL - типичный след N+1."""
+        return sum(number - 1 for number in self.statements.values())
+
+    def server_timing(self):
+        return (
+            f'db;dur={self.duration * 1000:.2f};'
+            f'desc="{self.count} queries, {self.duplicates} duplicates"'
+        )
+
+
+class QueryCountMiddleware:
+    """Считает SQL-запросы каждого запроса и сверяет их с бюджетом.
+
+    Итог пишется в лог `yatube.queries` и, если включён
+    QUERY_TIMING_HEADER, в заголовок Server-Timing. Бюджеты задаются
+    в QUERY_BUDGETS по имени URL ('posts:index': 5) - это бюджет
+    чтения (GET и HEAD); запись получает свой бюджет с методом перед
+    именем ('POST posts:post_create': 12) или не проверяется вовсе.
+    Превышение логируется, а при QUERY_BUDGET_STRICT поднимает
+    исключение, чтобы тест, открывший страницу, упал.
+
+    Потоковые ответы (StreamingHttpResponse) выполняют запросы уже
+    после выхода из middleware, пока сервер отдаёт тело: в учёт
+    попадают только запросы view, а бюджет к ним не применяется.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        stats = QueryStats()
+        with ExitStack() as stack:
+            for connection in connections.all():
+                stack.enter_context(connection.execute_wrapper(stats))
+            response = self.get_response(request)
+        match = request.resolver_match
+        view_name = match.view_name if match else None
+        logger.info(
+            '%s %s view=%s queries=%d duplicates=%d time=%.2fms%s',
+            request.method, request.path, view_name, stats.count,
+            stats.duplicates, stats.duration * 1000,
+            ' (без тела потокового ответа)' if response.streaming else ''
+        )
+        if getattr(settings, 'QUERY_TIMING_HEADER', False):
+            response['Server-Timing'] = stats.server_timing()
+        if not response.streaming:
+            self.check_budget(request.method, view_name, stats)
+        return response
+
+    def check_budget(self, method, view_name, stats):
+        budgets = getattr(settings, 'QUERY_BUDGETS', {})
+        budget = budgets.get(f'{method} {view_name}')
+        if budget is None and method in ('GET', 'HEAD'):
+            budget = budgets.get(view_name)
+        if budget is None or stats.count <= budget:
+            return
+        repeated = [
+            sql for sql, number in stats.statements.most_common(3)
+            if number > 1
+        ]
+        message = (
+            f'{method} {view_name}: {stats.count} запросов '
+            f'при бюджете {budget}; повторяются: {repeated}'
+        )
+        if getattr(settings, 'QUERY_BUDGET_STRICT', False):
+            raise QueryBudgetExceeded(message)
+        logger.warning(message)
+
+
+class ReplicaMiddleware:
+    """Включает чтение с реплик и «прилипание» к default после записи.
+
+    Небезопасные методы (POST и т.п.) целиком идут в default. Если
+    запрос что-то записал, пользователь получает cookie
+    REPLICA_PIN_COOKIE, и ещё REPLICA_PIN_SECONDS секунд его чтения
+    тоже идут в default: он сразу видит свой пост или комментарий,
+    даже если реплика отстаёт.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        routers.use_replicas(
+            request.method in ('GET', 'HEAD', 'OPTIONS')
+            and not self.pinned(request)
+        )
+        try:
+            response = self.get_response(request)
+            if routers.wrote():
+                self.pin(response)
+        finally:
+            routers.use_replicas(False)
+        return response
+
+    def pinned(self, request):
+        value = request.COOKIES.get(settings.REPLICA_PIN_COOKIE)
+        try:
+            return float(value) > time.time()
+        except (TypeError, ValueError):
+            return False
+
+    def pin(self, response):
+        seconds = settings.REPLICA_PIN_SECONDS
+        response.set_cookie(
+            settings.REPLICA_PIN_COOKIE, str(time.time() + seconds),
+            max_age=seconds, httponly=True, samesite='Lax'
+        )
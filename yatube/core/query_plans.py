@@ -0,0 +1,65 @@
+"""Проверка планов SQLite-запросов для тестов.
+
+    with CapturePlans() as plans:
+        client.get(url)
+    self.assertEqual(plans.problems(), [])
+
+Каждый SELECT, выполненный внутри блока, повторяется через
+EXPLAIN QUERY PLAN. Проблемой считается полный просмотр таблицы без
+индекса и сортировка во временном B-дереве: на больших данных это
+первые признаки пропущенного индекса.
+"""
+import re
+from contextlib import ExitStack
+
+from django.db import connections
+
+FULL_SCAN = re.compile(r'^SCAN (TABLE )?\w+$')
+TEMP_SORT = 'USE TEMP B-TREE'
+
+
+class CapturePlans:
+    """Собирает SELECT-запросы всех соединений и их планы."""
+
+    def __init__(self, allow=()):
+        # Подстроки «план: запрос», которые проблемой не считаются:
+        # например, 'SCAN posts_group' для справочника в форме.
+        self.allow = tuple(allow)
+        self.queries = []
+
+    def __call__(self, execute, sql, params, many, context):
+        if not many and sql.lstrip().upper().startswith('SELECT'):
+            self.queries.append((context['connection'], sql, params))
+        return execute(sql, params, many, context)
+
+    def __enter__(self):
+        self.stack = ExitStack()
+        for connection in connections.all():
+            if connection.vendor == 'sqlite':
+                self.stack.enter_context(connection.execute_wrapper(self))
+        return self
+
+    def __exit__(self, *exc_info):
+        self.stack.close()
+
+    def plans(self):
+        """[(sql, [строки плана])] для всех собранных запросов."""
+        result = []
+        for connection, sql, params in self.queries:
+            with connection.cursor() as cursor:
+                cursor.execute('EXPLAIN QUERY PLAN ' + sql, params)
+                details = [row[-1] for row in cursor.fetchall()]
+            result.append((sql, details))
+        return result
+
+    def problems(self):
+        """Строки «план: запрос» для просмотров таблиц и сортировок."""
+        found = []
+        for sql, details in self.plans():
+            for detail in details:
+                if not (FULL_SCAN.match(detail) or TEMP_SORT in detail):
+                    continue
+                line = f'{detail}: {sql}'
+                if not any(pattern in line for pattern in self.allow):
+                    found.append(line)
+        return found
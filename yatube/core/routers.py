@@ -0,0 +1,46 @@
+import random
+import threading
+
+from django.conf import settings
+
+_state = threading.local()
+
+
+def use_replicas(enabled):
+    """Разрешает (или запрещает) текущему потоку читать с реплик."""
+    _state.replicas = enabled
+    _state.wrote = False
+
+
+def wrote():
+    """Была ли запись в основную базу с последнего use_replicas()."""
+    return getattr(_state, 'wrote', False)
+
+
+class ReplicaRouter:
+    """Чтение - с реплик из DATABASE_REPLICAS, запись - в default.
+
+    Реплики используются только там, где их включил
+    core.middleware.ReplicaMiddleware: в безопасных запросах
+    пользователя, который недавно ничего не записывал. Команды,
+    потоки миниатюр и сигналы при записи читают из default, поэтому
+    не видят отставания реплик.
+    """
+
+    def db_for_read(self, model, **hints):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if replicas and getattr(_state, 'replicas', False):
+            return random.choice(replicas)
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        _state.wrote = True
+        # Всё, что ещё прочитает этот запрос, должно видеть запись.
+        _state.replicas = False
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *getattr(settings, 'DATABASE_REPLICAS', [])}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
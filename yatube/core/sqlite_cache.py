@@ -0,0 +1,284 @@
+"""Кеш в файле SQLite (WAL), общий для всех процессов одной машины.
+
+    CACHES = {'default': {
+        'BACKEND': 'core.sqlite_cache.SQLiteCache',
+        'LOCATION': '/var/cache/yatube/cache.sqlite3',
+    }}
+
+Защита от «стада» при истечении популярного ключа:
+
+* запись после истечения ещё GRACE секунд хранится как устаревшая;
+  первый, кто её запросит, получает блокировку и промах (и строит
+  значение заново), остальные до новой записи получают старое
+  значение - значение пересобирает один процесс;
+* незадолго до истечения ключ с вероятностью, растущей к концу
+  срока, отдаётся как промах одному читателю (XFetch): чем дольше
+  значение строилось, тем раньше начинается пересчёт. Время
+  построения - промежуток между промахом и set() того же ключа.
+"""
+import math
+import os
+import pickle
+import random
+import sqlite3
+import threading
+import time
+
+from django.core.cache.backends.base import DEFAULT_TIMEOUT, BaseCache
+
+SCHEMA = (
+    'CREATE TABLE IF NOT EXISTS cache ('
+    ' key TEXT PRIMARY KEY, value BLOB NOT NULL,'
+    ' expires REAL NOT NULL, delta REAL NOT NULL DEFAULT 0'
+    ') WITHOUT ROWID',
+    'CREATE INDEX IF NOT EXISTS cache_expires ON cache (expires)',
+    'CREATE TABLE IF NOT EXISTS locks ('
+    ' key TEXT PRIMARY KEY, until REAL NOT NULL'
+    ') WITHOUT ROWID',
+)
+# Срок «без истечения» (timeout=None): достаточно далёкое будущее.
+FOREVER = 2 ** 40
+# Ключей в одном SELECT ... IN: ниже предела параметров SQLite.
+IN_CHUNK = 500
+
+
+class SQLiteCache(BaseCache):
+    """Кеш-бэкенд Django поверх одного файла SQLite.
+
+    OPTIONS, кроме стандартных MAX_ENTRIES и CULL_FREQUENCY:
+    GRACE - сколько секунд после истечения отдавать устаревшее
+    значение, пока его пересобирают; LOCK_TIMEOUT - через сколько
+    секунд блокировка упавшего процесса перестаёт действовать;
+    BETA - множитель XFetch (0 отключает досрочный пересчёт).
+    """
+
+    def __init__(self, location, params):
+        super().__init__(params)
+        options = params.get('OPTIONS', {})
+        self.path = location
+        self.grace = options.get('GRACE', 60)
+        self.lock_timeout = options.get('LOCK_TIMEOUT', 30)
+        self.beta = options.get('BETA', 1.0)
+        self.local = threading.local()
+        self.sets = 0
+
+    # Соединение
+
+    @property
+    def db(self):
+        db = getattr(self.local, 'db', None)
+        # После fork соединение родителя использовать нельзя.
+        if db is None or self.local.pid != os.getpid():
+            directory = os.path.dirname(os.path.abspath(self.path))
+            os.makedirs(directory, exist_ok=True)
+            db = sqlite3.connect(self.path, timeout=5, isolation_level=None)
+            db.execute('PRAGMA journal_mode = wal')
+            db.execute('PRAGMA synchronous = normal')
+            for statement in SCHEMA:
+                db.execute(statement)
+            self.local.db = db
+            self.local.pid = os.getpid()
+            self.local.misses = {}
+        return db
+
+    def close(self, **kwargs):
+        # Соединение потока живёт вместе с процессом: открывать файл
+        # на каждый запрос дороже, чем держать его открытым.
+        pass
+
+    # Вспомогательное
+
+    def expiry(self, timeout):
+        """Момент истечения (get_backend_timeout отдаёт абсолютное время)."""
+        expires = self.get_backend_timeout(timeout)
+        return FOREVER if expires is None else expires
+
+    def lock(self, key, now):
+        """Берёт блокировку пересборки ключа; True - если удалось."""
+        cursor = self.db.execute(
+            'INSERT INTO locks (key, until) VALUES (?, ?) '
+            'ON CONFLICT (key) DO UPDATE SET until = excluded.until '
+            'WHERE locks.until < ?',
+            (key, now + self.lock_timeout, now)
+        )
+        return cursor.rowcount == 1
+
+    def miss(self, key):
+        """Запоминает начало пересборки, чтобы _write узнал её время.
+
+        Промахи, которые так и не записали, живут не дольше
+        LOCK_TIMEOUT: словарь упорядочен по времени, старые отметки
+        снимаются с его начала.
+        """
+        misses = self.local.misses
+        now = time.monotonic()
+        misses.pop(key, None)
+        misses[key] = now
+        while True:
+            oldest = next(iter(misses))
+            if now - misses[oldest] <= self.lock_timeout:
+                break
+            del misses[oldest]
+        return None
+
+    def early(self, expires, delta, now):
+        """XFetch: пора ли пересчитать ещё не истёкшее значение."""
+        if not self.beta or not delta:
+            return False
+        return now - delta * self.beta * math.log(random.random()) >= expires
+
+    def cull(self, now):
+        self.db.execute(
+            'DELETE FROM cache WHERE expires < ?', (now - self.grace,)
+        )
+        self.db.execute('DELETE FROM locks WHERE until < ?', (now,))
+        count = self.db.execute('SELECT COUNT(*) FROM cache').fetchone()[0]
+        if count > self._max_entries and self._cull_frequency:
+            self.db.execute(
+                'DELETE FROM cache WHERE key IN (SELECT key FROM cache '
+                'ORDER BY expires LIMIT ?)',
+                (count // self._cull_frequency,)
+            )
+
+    # API кеша
+
+    def pick(self, key, row, now, default):
+        """Значение строки (value, expires, delta) с учётом пересборки."""
+        if row is None:
+            self.miss(key)
+            return default
+        value, expires, delta = row
+        if expires <= now:
+            if expires + self.grace <= now or self.lock(key, now):
+                self.miss(key)
+                return default
+        elif self.early(expires, delta, now) and self.lock(key, now):
+            self.miss(key)
+            return default
+        return pickle.loads(value)
+
+    def get(self, key, default=None, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        row = self.db.execute(
+            'SELECT value, expires, delta FROM cache WHERE key = ?', (key,)
+        ).fetchone()
+        return self.pick(key, row, time.time(), default)
+
+    def get_many(self, keys, version=None):
+        """Все ключи одним SELECT ... IN вместо запроса на каждый."""
+        names = {}
+        for key in keys:
+            name = self.make_key(key, version=version)
+            self.validate_key(name)
+            names[name] = key
+        rows = {}
+        listed = list(names)
+        for start in range(0, len(listed), IN_CHUNK):
+            chunk = listed[start:start + IN_CHUNK]
+            rows.update(
+                (name, rest) for name, *rest in self.db.execute(
+                    'SELECT key, value, expires, delta FROM cache '
+                    'WHERE key IN (%s)' % ', '.join('?' * len(chunk)),
+                    chunk
+                )
+            )
+        now = time.time()
+        missing = object()
+        found = {}
+        for name, key in names.items():
+            value = self.pick(name, rows.get(name), now, missing)
+            if value is not missing:
+                found[key] = value
+        return found
+
+    def set(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self._write(key, value, timeout, replace=True)
+
+    def add(self, key, value, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self._write(key, value, timeout, replace=False)
+
+    def _write(self, key, value, timeout, replace):
+        db = self.db
+        now = time.time()
+        started = self.local.misses.pop(key, None)
+        delta = time.monotonic() - started if started else 0
+        data = pickle.dumps(value, pickle.HIGHEST_PROTOCOL)
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            if not replace:
+                row = db.execute(
+                    'SELECT expires FROM cache WHERE key = ?', (key,)
+                ).fetchone()
+                if row is not None and row[0] > now:
+                    db.execute('COMMIT')
+                    return False
+            db.execute(
+                'INSERT OR REPLACE INTO cache (key, value, expires, delta) '
+                'VALUES (?, ?, ?, ?)',
+                (key, data, self.expiry(timeout), delta)
+            )
+            db.execute('DELETE FROM locks WHERE key = ?', (key,))
+            self.sets += 1
+            if self.sets % 100 == 0:
+                self.cull(now)
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return True
+
+    def touch(self, key, timeout=DEFAULT_TIMEOUT, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        now = time.time()
+        cursor = self.db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ? AND expires > ?',
+            (self.expiry(timeout), key, now)
+        )
+        return cursor.rowcount == 1
+
+    def delete(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        self.db.execute('DELETE FROM cache WHERE key = ?', (key,))
+
+    def has_key(self, key, version=None):
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        return self.db.execute(
+            'SELECT 1 FROM cache WHERE key = ? AND expires > ?',
+            (key, time.time())
+        ).fetchone() is not None
+
+    def incr(self, key, delta=1, version=None):
+        """Атомарно для всех процессов: чтение и запись в одной транзакции."""
+        key = self.make_key(key, version=version)
+        self.validate_key(key)
+        db = self.db
+        db.execute('BEGIN IMMEDIATE')
+        try:
+            row = db.execute(
+                'SELECT value FROM cache WHERE key = ? AND expires > ?',
+                (key, time.time())
+            ).fetchone()
+            if row is None:
+                raise ValueError("Key '%s' not found" % key)
+            value = pickle.loads(row[0]) + delta
+            db.execute(
+                'UPDATE cache SET value = ? WHERE key = ?',
+                (pickle.dumps(value, pickle.HIGHEST_PROTOCOL), key)
+            )
+            db.execute('COMMIT')
+        except BaseException:
+            db.execute('ROLLBACK')
+            raise
+        return value
+
+    def clear(self):
+        self.db.execute('DELETE FROM cache')
+        self.db.execute('DELETE FROM locks')
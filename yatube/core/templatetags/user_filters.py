@@ -6,3 +6,19 @@ register = template.Library()
 @register.filter
 def addclass(field, css):
     return field.as_widget(attrs={'class': css})
+
+
+@register.simple_tag(takes_context=True)
+def query_transform(context, **kwargs):
+    """Текущий query string с заменёнными параметрами.
+
+    Параметр со значением None удаляется, остальные сохраняются -
+    например, строка поиска при переходе по страницам.
+    """
+    params = context['request'].GET.copy()
+    for name, value in kwargs.items():
+        if value is None:
+            params.pop(name, None)
+        else:
+            params[name] = value
+    return params.urlencode()
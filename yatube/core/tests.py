@@ -1,6 +1,20 @@
+import multiprocessing
+import os
+import tempfile
+import time
 from http import HTTPStatus
 
-from django.test import TestCase
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.db import connection, connections
+from django.test import TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+
+from core.sqlite_cache import SQLiteCache
+from posts.models import Post
+
+User = get_user_model()
 
 
 class ViewTestClass(TestCase):
@@ -8,3 +22,145 @@ class ViewTestClass(TestCase):
         response = self.client.get('/nonexist-page/')
         self.assertEqual(response.status_code, HTTPStatus.NOT_FOUND)
         self.assertTemplateUsed(response, 'core/404.html')
+
+
+class SqlitePragmasTestClass(TestCase):
+    def test_pragmas_applied_on_connect(self):
+        """Каждое соединение SQLite получает SQLITE_PRAGMAS."""
+        with connection.cursor() as cursor:
+            cursor.execute('PRAGMA busy_timeout')
+            self.assertEqual(cursor.fetchone()[0], 5000)
+            cursor.execute('PRAGMA synchronous')
+            self.assertEqual(cursor.fetchone()[0], 1)
+            cursor.execute('PRAGMA temp_store')
+            self.assertEqual(cursor.fetchone()[0], 2)
+
+
+@override_settings(DATABASE_REPLICAS=['replica1'])
+class ReplicaRouterTestClass(TransactionTestCase):
+    # Реплика в тестах - отдельное соединение с той же базой: данные
+    # должны быть зафиксированы, чтобы она их видела.
+    databases = {'default', 'replica1'}
+
+    def setUp(self):
+        self.user = User.objects.create_user(username='replica_user')
+        self.post = Post.objects.create(author=self.user, text='Пост')
+
+    def replica_queries(self, method, url, **kwargs):
+        with CaptureQueriesContext(connections['replica1']) as queries:
+            response = getattr(self.client, method)(url, **kwargs)
+        return response, len(queries)
+
+    def test_reads_go_to_replica(self):
+        """Страницы читаются с реплики, вне запросов - из default."""
+        response, count = self.replica_queries('get', reverse('posts:index'))
+        self.assertEqual(response.status_code, 200)
+        self.assertGreater(count, 0)
+        with CaptureQueriesContext(connections['replica1']) as queries:
+            Post.objects.count()
+        self.assertEqual(len(queries), 0)
+
+    def test_write_pins_reads_to_primary(self):
+        """После записи чтения пользователя идут в default."""
+        self.client.force_login(self.user)
+        url = reverse('posts:add_comment', args=[self.post.pk])
+        response, count = self.replica_queries(
+            'post', url, data={'text': 'Комментарий'}
+        )
+        self.assertEqual(count, 0)
+        self.assertIn(settings.REPLICA_PIN_COOKIE, response.cookies)
+        response, count = self.replica_queries(
+            'get', reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertEqual(count, 0)
+        self.assertContains(response, 'Комментарий')
+        self.client.cookies.pop(settings.REPLICA_PIN_COOKIE)
+        _, count = self.replica_queries(
+            'get', reverse('posts:post_detail', args=[self.post.pk])
+        )
+        self.assertGreater(count, 0)
+
+
+def add_in_process(location, results):
+    """Второй «воркер»: свой процесс и своё соединение с файлом кеша."""
+    cache = SQLiteCache(location, {})
+    results.put((cache.get('shared'), cache.add('shared', 'чужое')))
+
+
+class SQLiteCacheTestClass(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        self.location = os.path.join(directory.name, 'cache.sqlite3')
+        self.cache = self.make_cache()
+
+    def make_cache(self, **options):
+        options.setdefault('BETA', 0)
+        return SQLiteCache(self.location, {'OPTIONS': options})
+
+    def expire(self, cache, key):
+        cache.db.execute(
+            'UPDATE cache SET expires = ? WHERE key = ?',
+            (time.time() - 1, cache.make_key(key))
+        )
+
+    def test_basic_operations(self):
+        """get/set/add/incr/delete ведут себя как у остальных кешей."""
+        cache = self.cache
+        cache.set('key', {'a': 1})
+        self.assertEqual(cache.get('key'), {'a': 1})
+        self.assertFalse(cache.add('key', 'другое'))
+        self.assertTrue(cache.add('counter', 1))
+        self.assertEqual(cache.incr('counter'), 2)
+        self.assertEqual(
+            cache.get_many(['key', 'counter', 'missing']),
+            {'key': {'a': 1}, 'counter': 2}
+        )
+        cache.delete('key')
+        self.assertIsNone(cache.get('key'))
+        with self.assertRaises(ValueError):
+            cache.incr('missing')
+
+    def test_shared_between_processes(self):
+        """Запись одного процесса видна другому, add атомарен."""
+        self.cache.set('shared', 'общее')
+        results = multiprocessing.get_context('fork').Queue()
+        process = multiprocessing.get_context('fork').Process(
+            target=add_in_process, args=(self.location, results)
+        )
+        process.start()
+        process.join()
+        self.assertEqual(results.get(timeout=5), ('общее', False))
+
+    def test_single_flight_on_expiry(self):
+        """Истёкший ключ пересобирает один, остальные видят старое."""
+        self.cache.set('page', 'старое')
+        self.expire(self.cache, 'page')
+        other = self.make_cache()
+        self.assertIsNone(self.cache.get('page'))
+        self.assertEqual(other.get('page'), 'старое')
+        self.cache.set('page', 'новое')
+        self.assertEqual(other.get('page'), 'новое')
+
+    def test_expired_beyond_grace(self):
+        cache = self.make_cache(GRACE=0)
+        cache.set('page', 'старое')
+        self.expire(cache, 'page')
+        self.assertIsNone(cache.get('page'))
+        self.assertIsNone(self.make_cache(GRACE=0).get('page'))
+
+    def test_early_recompute(self):
+        """XFetch: долго строившийся ключ пересчитывают до истечения."""
+        cache = self.make_cache(BETA=1e9)
+        self.assertIsNone(cache.get('page'))
+        time.sleep(0.01)
+        cache.set('page', 'значение', timeout=60)
+        self.assertIsNone(cache.get('page'))
+        self.assertEqual(self.make_cache(BETA=1e9).get('page'), 'значение')
+
+    def test_unwritten_misses_expire(self):
+        """Промахи без записи не копятся дольше LOCK_TIMEOUT."""
+        cache = self.make_cache(LOCK_TIMEOUT=0)
+        for number in range(100):
+            cache.get(f'missing-{number}')
+        self.assertLessEqual(len(cache.local.misses), 1)
@@ -2,6 +2,7 @@ from django.contrib import admin
 
 # Register your models here.
 from .models import Group, Post
+from . import search
 
 
 class PostAdmin(admin.ModelAdmin):
@@ -11,6 +12,15 @@ class PostAdmin(admin.ModelAdmin):
     empty_value_display = '-пусто-'
     list_editable = ('group',)
 
+    def get_search_results(self, request, queryset, search_term):
+        # Поиск по индексу FTS5 вместо LIKE '%...%' по всей таблице.
+        match = search.match_expression(search_term)
+        if not match or not search.is_available():
+            return super().get_search_results(
+                request, queryset, search_term
+            )
+        return queryset.filter(pk__in=search.matching_ids(match)), False
+
 
 admin.site.register(Post, PostAdmin)
 admin.site.register(Group)
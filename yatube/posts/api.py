@@ -0,0 +1,252 @@
+"""JSON-версии страниц posts.urls для мобильного клиента.
+
+Списки отдаются курсорными страницами (`?cursor=`), параметр
+`?fields=id,text,author` сужает и ответ, и SELECT: в запрос попадают
+только нужные колонки, а связи подтягиваются JOIN'ом лишь тогда, когда
+их поля запрошены. ETag строится из поколений списка и всего, что
+попало в ответ (posts.cache): постов окна со счётчиками комментариев,
+шапки профиля. Повторный запрос с актуальной копией получает 304 без
+загрузки постов - выбираются только их pk.
+"""
+import hashlib
+
+from django.conf import settings
+from django.http import JsonResponse
+from django.shortcuts import get_object_or_404
+from django.utils.cache import get_conditional_response
+from django.views.decorators.http import etag
+
+from .cache import generations
+from .counters import stats_of
+from .feed import follow_feed_page
+from .models import Comment, Group, Post, User
+from .utils import KeysetPaginator
+from .views import post_detail_scopes
+
+# Поле ответа -> (колонки для .only(), значение из объекта).
+POST_FIELDS = {
+    'id': ((), lambda post: post.pk),
+    'text': (('text',), lambda post: post.text),
+    'pub_date': (('pub_date',), lambda post: post.pub_date),
+    'author': (('author__username',), lambda post: post.author.username),
+    'group': (
+        ('group__slug',),
+        lambda post: post.group.slug if post.group_id else None
+    ),
+    'image': (
+        ('image',), lambda post: post.image.url if post.image else None
+    ),
+    'comments_count': (
+        ('comments_count',), lambda post: post.comments_count
+    ),
+}
+COMMENT_FIELDS = {
+    'id': ((), lambda comment: comment.pk),
+    'post': (('post',), lambda comment: comment.post_id),
+    'text': (('text',), lambda comment: comment.text),
+    'created': (('created',), lambda comment: comment.created),
+    'author': (
+        ('author__username',), lambda comment: comment.author.username
+    ),
+}
+POST_ORDERING = ('-pub_date', '-pk')
+POST_ORDERING_FIELDS = tuple(name.lstrip('-') for name in POST_ORDERING)
+COMMENT_ORDERING = ('created', 'pk')
+
+
+class FieldsError(ValueError):
+    pass
+
+
+def requested_fields(request, known):
+    """Поля из ?fields=, по умолчанию - все."""
+    value = request.GET.get('fields')
+    if not value:
+        return list(known)
+    fields = [name.strip() for name in value.split(',') if name.strip()]
+    unknown = [name for name in fields if name not in known]
+    if unknown:
+        raise FieldsError('Неизвестные поля: ' + ', '.join(unknown))
+    return fields
+
+
+def fields_or_all(request):
+    """Поля ответа со списком постов; с ошибкой ответит сам view."""
+    try:
+        return requested_fields(request, POST_FIELDS)
+    except FieldsError:
+        return list(POST_FIELDS)
+
+
+def narrow(queryset, fields, known, ordering):
+    """Только нужные колонки и JOIN'ы; ключ курсора выбирается всегда."""
+    columns = {name.lstrip('-') for name in ordering} | {'pk'}
+    relations = set()
+    for name in fields:
+        for column in known[name][0]:
+            columns.add(column)
+            if '__' in column:
+                relation = column.split('__')[0]
+                relations.add(relation)
+                columns.add(relation)
+    queryset = queryset.select_related(*relations) if relations else (
+        queryset.select_related(None)
+    )
+    return queryset.prefetch_related(None).only(*columns)
+
+
+def serialize(obj, fields, known):
+    return {name: known[name][1](obj) for name in fields}
+
+
+def page_data(page_obj, fields, known):
+    return {
+        'results': [serialize(obj, fields, known) for obj in page_obj],
+        'next': getattr(page_obj, 'next_cursor', None),
+        'previous': getattr(page_obj, 'previous_cursor', None),
+    }
+
+
+def api_response(data, status=200):
+    return JsonResponse(
+        data, status=status, json_dumps_params={'ensure_ascii': False}
+    )
+
+
+def list_response(request, queryset, known, ordering, per_page, extra=None):
+    try:
+        fields = requested_fields(request, known)
+    except FieldsError as error:
+        return api_response({'error': str(error)}, status=400)
+    paginator = KeysetPaginator(
+        narrow(queryset, fields, known, ordering), per_page, ordering
+    )
+    data = dict(extra or {})
+    data.update(page_data(
+        paginator.get_page(request.GET.get('cursor')), fields, known
+    ))
+    return api_response(data)
+
+
+def generation_etag(*scope_args, window=None, extra=None):
+    """ETag из поколений списка; scope_args - имена из URL-параметров.
+
+    Первая часть scope - литерал: ('group', 'slug') превращается
+    в поколение ('group', <slug из URL>). window(**kwargs) - выборка
+    списка: к ETag добавляются поколения постов страницы, которые
+    меняются и от комментариев. extra(**kwargs) - другие scope,
+    данные которых есть в ответе.
+    """
+    kind, *names = scope_args
+
+    def etag_func(request, **kwargs):
+        scopes = [[kind] + [kwargs[name] for name in names]]
+        if window is not None and 'comments_count' in fields_or_all(request):
+            paginator = KeysetPaginator(
+                window(**kwargs).only(*POST_ORDERING_FIELDS),
+                settings.POSTS_PER_PAGE, POST_ORDERING
+            )
+            page = paginator.get_page(request.GET.get('cursor'))
+            scopes.extend(('post', post.pk) for post in page)
+        if extra is not None:
+            scopes.extend(extra(**kwargs))
+        raw = ':'.join(
+            str(part) for part in [request.get_full_path()]
+            + generations(scopes)
+        )
+        return hashlib.md5(raw.encode()).hexdigest()
+
+    return etag_func
+
+
+@etag(generation_etag('index', window=lambda: Post.objects.all()))
+def index(request):
+    return list_response(
+        request, Post.objects.all(), POST_FIELDS, POST_ORDERING,
+        settings.POSTS_PER_PAGE
+    )
+
+
+@etag(generation_etag(
+    'group', 'slug',
+    window=lambda slug: Post.objects.filter(group__slug=slug)
+))
+def group_posts(request, slug):
+    group = get_object_or_404(Group, slug=slug)
+    extra = {'group': {
+        'slug': group.slug,
+        'title': group.title,
+        'description': group.description,
+    }}
+    return list_response(
+        request, group.posts.all(), POST_FIELDS, POST_ORDERING,
+        settings.POSTS_PER_PAGE, extra
+    )
+
+
+@etag(generation_etag(
+    'author', 'username',
+    window=lambda username: Post.objects.filter(author__username=username),
+    extra=lambda username: [('profile', username)]
+))
+def profile(request, username):
+    author = get_object_or_404(
+        User.objects.select_related('stats'), username=username
+    )
+    stats = stats_of(author)
+    extra = {'author': {
+        'username': author.username,
+        'full_name': author.get_full_name(),
+        'posts_count': stats.posts_count,
+        'followers_count': stats.followers_count,
+        'following_count': stats.following_count,
+    }}
+    return list_response(
+        request, author.posts.all(), POST_FIELDS, POST_ORDERING,
+        settings.POSTS_PER_PAGE, extra
+    )
+
+
+@etag(generation_etag(
+    'post', 'post_id',
+    # Автор и группа поста видны в ответе, а их правки поста не меняют.
+    extra=lambda post_id: post_detail_scopes(post_id)[1:]
+))
+def post_detail(request, post_id):
+    try:
+        fields = requested_fields(request, POST_FIELDS)
+    except FieldsError as error:
+        return api_response({'error': str(error)}, status=400)
+    queryset = narrow(Post.objects.all(), fields, POST_FIELDS, ())
+    post = get_object_or_404(queryset, pk=post_id)
+    return api_response(serialize(post, fields, POST_FIELDS))
+
+
+@etag(generation_etag('post', 'post_id'))
+def post_comments(request, post_id):
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    return list_response(
+        request, Comment.objects.filter(post_id=post_id), COMMENT_FIELDS,
+        COMMENT_ORDERING, settings.COMMENTS_PER_PAGE
+    )
+
+
+def follow_index(request):
+    """Лента подписок.
+
+    Лента своя у каждого читателя и поколения не имеет, поэтому ETag
+    считается по телу ответа, а ?fields= только сужает ответ: загрузку
+    выполняет та же follow_feed_page, что и у HTML-страницы.
+    """
+    if not request.user.is_authenticated:
+        return api_response({'error': 'Нужна авторизация'}, status=401)
+    try:
+        fields = requested_fields(request, POST_FIELDS)
+    except FieldsError as error:
+        return api_response({'error': str(error)}, status=400)
+    response = api_response(
+        page_data(follow_feed_page(request), fields, POST_FIELDS)
+    )
+    tag = '"%s"' % hashlib.md5(response.content).hexdigest()
+    response['ETag'] = tag
+    return get_conditional_response(request, etag=tag, response=response)
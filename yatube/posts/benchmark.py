@@ -0,0 +1,200 @@
+"""Замеры страниц posts на наполненной базе (см. manage.py seed).
+
+Каждая страница открывается тестовым клиентом Django на нескольких
+глубинах курсорной пагинации; для каждой глубины считаются
+перцентили времени ответа, пропускная способность, число SQL-запросов
+и пик памяти. Результат сравнивается с сохранённым базовым замером.
+"""
+import gc
+import math
+import re
+import time
+import tracemalloc
+from contextlib import ExitStack
+from html import unescape
+
+from django.core.cache import cache
+from django.db import connections
+from django.db.models import Count
+from django.test import Client
+from django.urls import reverse
+
+from core.middleware import QueryStats
+
+from .models import Comment, FeedEntry, Follow, Group, Post, User
+
+NEXT_LINK = re.compile(r'href="\?([^"]+)">\s*Следующая')
+# Метрики, которые сверяются с базовым замером: рост времени и памяти
+# допускается в пределах порога, число запросов расти не должно.
+# p99 при десятках запросов - почти максимум и слишком шумный.
+METRICS = {
+    'p50_ms': True,
+    'p95_ms': True,
+    'peak_kb': True,
+    'queries': False,
+}
+
+
+def percentile(values, share):
+    """Перцентиль методом ближайшего ранга."""
+    ordered = sorted(values)
+    rank = max(math.ceil(share * len(ordered)), 1)
+    return ordered[rank - 1]
+
+
+def calibrate(rounds=7):
+    """Время эталонной нагрузки в мс: мерило скорости машины.
+
+    Замеры сравниваются с базовым с поправкой на отношение эталонов,
+    чтобы смена машины или её загрузки не выглядела регрессией.
+    """
+    timings = []
+    for _ in range(rounds):
+        started = time.perf_counter()
+        sorted(str(number * 7919 % 10007) for number in range(200000))
+        timings.append(time.perf_counter() - started)
+    return round(percentile(timings, 0.5) * 1000, 3)
+
+
+def dataset():
+    """Объём данных, на котором сделан замер."""
+    return {
+        'users': User.objects.count(),
+        'groups': Group.objects.count(),
+        'posts': Post.objects.count(),
+        'comments': Comment.objects.count(),
+        'follows': Follow.objects.count(),
+        'feed_entries': FeedEntry.objects.count(),
+    }
+
+
+def targets():
+    """Страницы для замера на самых «тяжёлых» объектах базы.
+
+    Возвращает {имя: (url, пользователь)}. Все страницы открывает
+    вошедший читатель: гость получил бы копию страницы из кеша
+    (posts.cache.anonymous_page), и замер мерил бы поиск в кеше,
+    а не view.
+    """
+    group = Group.objects.annotate(
+        total=Count('posts')
+    ).order_by('-total', 'pk').first()
+    author = User.objects.order_by('-stats__posts_count', 'pk').first()
+    post = Post.objects.order_by('-comments_count', 'pk').first()
+    reader = User.objects.order_by('-stats__following_count', 'pk').first()
+    if None in (group, author, post, reader):
+        raise ValueError('База пуста: сначала выполните manage.py seed')
+    return {
+        'index': (reverse('posts:index'), reader),
+        'group_posts': (
+            reverse('posts:group_list', args=[group.slug]), reader
+        ),
+        'profile': (reverse('posts:profile', args=[author.username]), reader),
+        'post_detail': (
+            reverse('posts:post_detail', args=[post.pk]), reader
+        ),
+        'follow_index': (reverse('posts:follow_index'), reader),
+    }
+
+
+def timed_get(client, url):
+    """Время ответа в секундах и число SQL-запросов одного GET."""
+    stats = QueryStats()
+    with ExitStack() as stack:
+        for connection in connections.all():
+            stack.enter_context(connection.execute_wrapper(stats))
+        started = time.perf_counter()
+        response = client.get(url)
+        elapsed = time.perf_counter() - started
+    if response.status_code != 200:
+        raise ValueError(f'{url}: ответ {response.status_code}')
+    return elapsed, stats.count, response
+
+
+def pages(client, url, depths):
+    """{глубина: url} по ссылкам «Следующая», пока страницы есть."""
+    found = {}
+    current, depth = url, 1
+    while depth <= max(depths):
+        if depth in depths:
+            found[depth] = current
+        response = client.get(current)
+        match = NEXT_LINK.search(response.content.decode())
+        if not match:
+            break
+        current = url.split('?')[0] + '?' + unescape(match.group(1))
+        depth += 1
+    return found
+
+
+def measure(client, url, requests, warmup, cold):
+    for _ in range(warmup):
+        timed_get(client, url)
+    latencies, queries = [], []
+    # Сборщик мусора выключен на время замера, чтобы его паузы
+    # не попадали в случайные запросы и не шумели в перцентилях.
+    gc.collect()
+    gc.disable()
+    try:
+        for _ in range(requests):
+            if cold:
+                cache.clear()
+            elapsed, count, _ = timed_get(client, url)
+            latencies.append(elapsed)
+            queries.append(count)
+    finally:
+        gc.enable()
+    if cold:
+        cache.clear()
+    tracemalloc.start()
+    try:
+        timed_get(client, url)
+        peak = tracemalloc.get_traced_memory()[1]
+    finally:
+        tracemalloc.stop()
+    return {
+        'p50_ms': round(percentile(latencies, 0.50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 0.95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 0.99) * 1000, 3),
+        'rps': round(len(latencies) / sum(latencies), 1),
+        'queries': max(queries),
+        'peak_kb': round(peak / 1024, 1),
+    }
+
+
+def run(requests=50, warmup=5, depths=(1, 5, 20), cold=False):
+    """Замер всех страниц: {'имя@глубина': метрики}."""
+    results = {}
+    for name, (url, user) in targets().items():
+        client = Client(HTTP_HOST='localhost')
+        client.force_login(user)
+        for depth, page_url in pages(client, url, depths).items():
+            results[f'{name}@{depth}'] = measure(
+                client, page_url, requests, warmup, cold
+            )
+    return results
+
+
+def compare(results, baseline, threshold, speed=1.0):
+    """Регрессии относительно baseline: список строк-описаний.
+
+    speed - во сколько раз эталон сейчас медленнее, чем при базовом
+    замере; на него умножаются допустимые времена.
+    """
+    regressions = []
+    for key, metrics in sorted(results.items()):
+        base = baseline.get(key)
+        if base is None:
+            continue
+        for metric, relative in METRICS.items():
+            if metric not in base:
+                continue
+            scale = speed if metric.endswith('_ms') else 1.0
+            limit = base[metric] * scale * (1 + threshold) if relative else (
+                base[metric]
+            )
+            if metrics[metric] > limit:
+                regressions.append(
+                    f'{key} {metric}: {metrics[metric]} > {base[metric]}'
+                )
+    return regressions
@@ -0,0 +1,70 @@
+from collections import Counter
+from contextlib import contextmanager
+from itertools import islice
+
+from . import cache, counters, feed, timeline
+from .models import Follow, Group, User
+
+# Сколько id отдаётся в один IN (...): у SQLite есть предел параметров.
+IN_CHUNK = 500
+
+
+def batched(iterable, size):
+    """Списки по size элементов из любого итератора."""
+    iterator = iter(iterable)
+    while True:
+        batch = list(islice(iterator, size))
+        if not batch:
+            return
+        yield batch
+
+
+@contextmanager
+def explicit_dates(model, *names):
+    """Даёт bulk_create записать свои значения в поля auto_now_add."""
+    fields = [model._meta.get_field(name) for name in names]
+    previous = [field.auto_now_add for field in fields]
+    for field in fields:
+        field.auto_now_add = False
+    try:
+        yield
+    finally:
+        for field, value in zip(fields, previous):
+            field.auto_now_add = value
+
+
+def posts_inserted(posts):
+    """Счётчики и кеш после bulk_create постов (сигналов там нет)."""
+    per_author = Counter(post.author_id for post in posts)
+    for author_id, total in per_author.items():
+        counters.bump(author_id, posts_count=total)
+        timeline.forget(author_id)
+    return per_author.keys()
+
+
+def comments_inserted(comments):
+    per_post = Counter(comment.post_id for comment in comments)
+    for post_id, total in per_post.items():
+        counters.bump_comments(post_id, total)
+        cache.bump('post', post_id)
+
+
+def refresh_feeds(author_ids):
+    """Досыпает новые посты авторов в ленты их подписчиков."""
+    for chunk in batched(author_ids, IN_CHUNK):
+        follows = Follow.objects.filter(author_id__in=chunk)
+        for follow in follows.iterator():
+            feed.backfill(follow)
+
+
+def refresh_lists(author_ids, group_ids=()):
+    """Сбрасывает поколения списков, в которые попали новые посты."""
+    cache.bump('index')
+    for chunk in batched(author_ids, IN_CHUNK):
+        users = User.objects.filter(pk__in=chunk)
+        for username in users.values_list('username', flat=True):
+            cache.bump('author', username)
+    for chunk in batched(group_ids, IN_CHUNK):
+        groups = Group.objects.filter(pk__in=chunk)
+        for slug in groups.values_list('slug', flat=True):
+            cache.bump('group', slug)
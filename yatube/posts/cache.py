@@ -0,0 +1,317 @@
+import hashlib
+import math
+import time
+from functools import wraps
+
+from django.conf import settings
+from django.core.cache import cache
+from django.db import transaction
+from django.db.models import prefetch_related_objects
+from django.http import HttpResponse
+from django.template.loader import render_to_string
+from django.utils.cache import get_conditional_response, patch_vary_headers
+from django.utils.http import http_date, parse_http_date_safe, quote_etag
+
+
+def scope_key(prefix, scope):
+    """Ключ списка: части scope (username, slug) хешируются, так что
+    пробелы, кириллица и длина не мешают memcached."""
+    return prefix + hashlib.md5(
+        ':'.join(str(part) for part in scope).encode()
+    ).hexdigest()
+
+
+def generation_key(*scope):
+    return scope_key('generation:', scope)
+
+
+def generation(*scope):
+    """Текущее поколение списка: ('index',), ('group', slug) и т.д.
+
+    Поколение входит в ключ фрагментного кеша, поэтому после записи
+    старые фрагменты просто перестают запрашиваться.
+    """
+    key = generation_key(*scope)
+    value = cache.get(key)
+    if value is None:
+        # Начинаем с текущего времени, чтобы после вытеснения ключа
+        # не вернуться к поколению, под которым лежат старые фрагменты.
+        value = int(time.time() * 1000)
+        cache.add(key, value, None)
+        value = cache.get(key, value)
+    return value
+
+
+def generations(scopes):
+    """Поколения нескольких списков одним get_many."""
+    keys = {generation_key(*scope): scope for scope in scopes}
+    found = cache.get_many(keys)
+    return [
+        found[key] if key in found else generation(*scope)
+        for key, scope in keys.items()
+    ]
+
+
+def changed_key(*scope):
+    return scope_key('changed:', scope)
+
+
+def changed_at(scopes):
+    """Момент последней записи в любой из списков (секунды) или None.
+
+    Удаление поста делает max(updated_at) окна только старше; этот
+    момент сдвигает Last-Modified вперёд и для такой записи.
+    """
+    stamps = cache.get_many([changed_key(*scope) for scope in scopes])
+    return max(stamps.values(), default=None)
+
+
+def bump(*scope):
+    """Новое поколение списка и момент его изменения.
+
+    Внутри транзакции поколение сдвигается ещё раз после коммита:
+    читатель, взявший новое поколение до коммита, собирает страницу
+    из старых строк, и такая копия не должна пережить запись.
+    """
+    advance(scope)
+    if transaction.get_connection().in_atomic_block:
+        transaction.on_commit(lambda: advance(scope))
+
+
+def advance(scope):
+    key = generation_key(*scope)
+    try:
+        cache.incr(key)
+    except ValueError:
+        cache.set(key, int(time.time() * 1000), None)
+    # С округлением вверх: Last-Modified ответов не позже начала
+    # секунды ответа, и любая более поздняя запись окажется новее.
+    cache.set(changed_key(*scope), math.ceil(time.time()), None)
+
+
+def post_scopes(post):
+    """Списки, в которых виден пост."""
+    scopes = [('index',), ('author', post.author.username), ('post', post.pk)]
+    if post.group_id:
+        scopes.append(('group', post.group.slug))
+    return scopes
+
+
+CARD_TEMPLATE = 'posts/includes/post_card.html'
+
+
+def card_key(post):
+    """Ключ карточки поста: id и версия, правка даёт новый ключ."""
+    return f'card:{post.pk}:{post.updated_at.timestamp()}'
+
+
+def forget_card(post):
+    cache.delete(card_key(post))
+
+
+def render_cards(posts):
+    """HTML карточек постов: одно get_many, собираются только промахи.
+
+    Карточка не зависит ни от страницы, ни от читателя, поэтому одна
+    копия служит главной, группе, профилю и ленте подписок. Списки
+    не подгружают варианты картинок заранее: при тёплом кеше карточек
+    этот запрос не нужен.
+    """
+    posts = list(posts)
+    keys = [card_key(post) for post in posts]
+    cards = cache.get_many(keys)
+    stale = [post for key, post in zip(keys, posts) if key not in cards]
+    # Варианты картинок нужны только для сборки промахов с картинкой.
+    prefetch_related_objects(
+        [post for post in stale if post.image], 'renditions'
+    )
+    missing = {
+        card_key(post): render_to_string(CARD_TEMPLATE, {'post': post})
+        for post in stale
+    }
+    if missing:
+        cache.set_many(missing, settings.CACHES_TIME)
+        cards.update(missing)
+    return [cards[key] for key in keys]
+
+
+def fragment_context(*scope):
+    """Переменные шаблона для {% cache cache_time ... generation %}."""
+    return {
+        'cache_time': settings.CACHES_TIME,
+        'generation': generation(*scope),
+    }
+
+
+def is_anonymous_read(request):
+    """Запрос читателя без сессии: такому отдаётся общая копия страницы.
+
+    Смотрим на cookie, а не на request.user: проверка пользователя
+    стоила бы запроса к сессии. Cookie сообщений тоже исключает
+    кеш - иначе сообщение не показалось бы.
+    """
+    return (
+        request.method in ('GET', 'HEAD')
+        and settings.SESSION_COOKIE_NAME not in request.COOKIES
+        and 'messages' not in request.COOKIES
+    )
+
+
+def anonymous_page(scopes):
+    """Кеш целых страниц для анонимных читателей.
+
+    scopes(**kwargs) возвращает списки, из которых собрана страница;
+    их поколения входят в ключ вместе с путём, номером страницы и
+    курсором, так что запись в любой из списков сама делает старую
+    копию ненужной. Кешируются только ответы 200 без cookie;
+    ответ получает Vary: Cookie, чтобы промежуточные кеши не отдали
+    анонимную копию вошедшему пользователю. ETag и Last-Modified
+    (см. conditional_page) хранятся вместе с копией.
+    """
+    def decorator(view):
+        @wraps(view)
+        def wrapper(request, **kwargs):
+            if not is_anonymous_read(request):
+                response = view(request, **kwargs)
+                patch_vary_headers(response, ('Cookie',))
+                return response
+            parts = [
+                request.path,
+                request.GET.get('page', ''),
+                request.GET.get('cursor', ''),
+            ]
+            for scope in scopes(**kwargs):
+                parts.extend([*scope, generation(*scope)])
+            key = 'page:' + hashlib.md5(
+                ':'.join(str(part) for part in parts).encode()
+            ).hexdigest()
+            entry = cache.get(key)
+            if entry is None:
+                response = view(request, **kwargs)
+                patch_vary_headers(response, ('Cookie',))
+                if response.status_code != 200 or response.cookies:
+                    return response
+                entry = (
+                    response.content, response['Content-Type'],
+                    response.get('ETag'), response.get('Last-Modified'),
+                )
+                cache.set(key, entry, settings.CACHES_TIME)
+                return response
+            content, content_type, etag, last_modified = entry
+            response = HttpResponse(content, content_type=content_type)
+            patch_vary_headers(response, ('Cookie',))
+            if etag:
+                response['ETag'] = etag
+            if last_modified:
+                response['Last-Modified'] = last_modified
+            # Заголовки сохранены с копией - 304 тоже без обращений к базе.
+            return get_conditional_response(
+                request, etag=etag,
+                last_modified=parse_http_date_safe(last_modified or ''),
+                response=response
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def conditional_page(versions, scopes=None):
+    """ETag и Last-Modified страницы: клиент с актуальной копией
+    получает 304, а view и шаблон не выполняются.
+
+    versions(request, **kwargs) возвращает (части ETag, момент
+    последнего изменения) - например, pk и updated_at постов окна
+    страницы - или None, если страницы нет (тогда отвечает view).
+    Если у versions есть rendered(response), а в запросе нет ни
+    If-None-Match, ни If-Modified-Since, отдельный запрос версий не
+    выполняется: они берутся из контекста ответа view
+    (TemplateResponse); рендерит его сам conditional_page.
+    Поколения scopes(**kwargs) добавляются к ETag: так он меняется
+    и от правок, которых нет в updated_at (группа, подписки), а
+    момент последней записи в них (changed_at) - к Last-Modified:
+    удаление поста не делает ответ для If-Modified-Since старым.
+    """
+    def decorator(view):
+        def build(request, **kwargs):
+            response = view(request, **kwargs)
+            if hasattr(response, 'render'):
+                # Снаружи (anonymous_page) нужно уже готовое тело.
+                response.render()
+            return response
+
+        @wraps(view)
+        def wrapper(request, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return build(request, **kwargs)
+            # Поколения читаются до сборки страницы: запись во время
+            # сборки не должна попасть в ETag старого содержимого.
+            state = scope_state(scopes(**kwargs) if scopes else [])
+            rendered = getattr(versions, 'rendered', None)
+            if rendered is not None and not is_conditional(request):
+                response = build(request, **kwargs)
+                version = rendered(response)
+                if version is None:
+                    return response
+                return with_validators(
+                    response, *validators(request, version, state)
+                )
+            version = versions(request, **kwargs)
+            if version is None:
+                return build(request, **kwargs)
+            etag, last_modified = validators(request, version, state)
+            response = get_conditional_response(
+                request, etag=etag, last_modified=last_modified
+            )
+            if response is not None:
+                return response
+            return with_validators(
+                build(request, **kwargs), etag, last_modified
+            )
+
+        return wrapper
+
+    return decorator
+
+
+def is_conditional(request):
+    return (
+        'HTTP_IF_NONE_MATCH' in request.META
+        or 'HTTP_IF_MODIFIED_SINCE' in request.META
+    )
+
+
+def scope_state(scopes):
+    """Поколения списков для ETag и момент последней записи в них."""
+    parts = []
+    for scope in scopes:
+        parts.extend([*scope, generation(*scope)])
+    return parts, changed_at(scopes)
+
+
+def validators(request, version, state):
+    """ETag и Last-Modified (секунды) страницы по её версиям."""
+    parts, modified = version
+    scope_parts, scope_changed = state
+    # Вошедшему пользователю страница строится иначе.
+    parts = [request.get_full_path(), request.user.pk, *parts, *scope_parts]
+    etag = quote_etag(hashlib.md5(
+        ':'.join(str(part) for part in parts).encode()
+    ).hexdigest())
+    stamps = [scope_changed]
+    if modified:
+        stamps.append(int(modified.timestamp()))
+    last_modified = max((stamp for stamp in stamps if stamp), default=None)
+    return etag, last_modified
+
+
+def with_validators(response, etag, last_modified):
+    if response.status_code == 200:
+        response['ETag'] = etag
+        if last_modified:
+            # Не позже начала текущей секунды: запись, случившаяся
+            # после ответа в ту же секунду, окажется новее его.
+            response['Last-Modified'] = http_date(
+                min(last_modified, int(time.time()))
+            )
+    return response
@@ -0,0 +1,100 @@
+"""Денормализованные счётчики постов, подписок и комментариев.
+
+Сигналы (posts.signals) меняют счётчик после save()/delete(), то есть
+уже вне транзакции самой записи; чтобы запись и счётчик фиксировались
+вместе, вызывающий код оборачивает их в transaction.atomic (так
+делают представления posts.views и админка). Записи мимо сигналов
+выравнивает manage.py reconcile_counters.
+"""
+from django.db import transaction
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery
+from django.db.models.functions import Coalesce
+
+from .models import AuthorStats, Comment, Follow, Post, User
+
+
+def _count(queryset, field):
+    """Подзапрос COUNT(*) по связанной строке внешнего запроса."""
+    return Coalesce(
+        Subquery(
+            queryset.filter(**{field: OuterRef('pk')})
+            .order_by().values(field)
+            .annotate(total=Count('pk')).values('total'),
+            output_field=IntegerField()
+        ),
+        0
+    )
+
+
+def _not_below_zero(deltas):
+    """Условие, не дающее счётчику уйти в минус при расхождении."""
+    return {
+        f'{name}__gte': -delta for name, delta in deltas.items() if delta < 0
+    }
+
+
+def bump(user_id, **deltas):
+    """Меняет счётчики пользователя на deltas одним UPDATE."""
+    changes = {name: F(name) + delta for name, delta in deltas.items()}
+    with transaction.atomic():
+        updated = AuthorStats.objects.filter(
+            user_id=user_id, **_not_below_zero(deltas)
+        ).update(**changes)
+        if not updated and all(delta > 0 for delta in deltas.values()):
+            # Строки ещё нет (например, пользователь создан bulk_create).
+            reconcile_authors(User.objects.filter(pk=user_id))
+
+
+def stats_of(user):
+    """Счётчики пользователя; строки нет - создаётся, как в bump."""
+    try:
+        return user.stats
+    except AuthorStats.DoesNotExist:
+        reconcile_authors(User.objects.filter(pk=user.pk))
+        return AuthorStats.objects.get(user_id=user.pk)
+
+
+def bump_comments(post_id, delta):
+    Post.objects.filter(
+        pk=post_id, **_not_below_zero({'comments_count': delta})
+    ).update(comments_count=F('comments_count') + delta)
+
+
+def reconcile_authors(users=None):
+    """Пересчитывает счётчики авторов, возвращает число исправленных."""
+    if users is None:
+        users = User.objects.all()
+    missing = users.filter(stats__isnull=True).values_list('pk', flat=True)
+    created = AuthorStats.objects.bulk_create(
+        (AuthorStats(user_id=pk) for pk in missing.iterator()),
+        ignore_conflicts=True
+    )
+    actual = {
+        'posts_count': _count(Post.objects, 'author'),
+        'followers_count': _count(Follow.objects, 'author'),
+        'following_count': _count(Follow.objects, 'user'),
+    }
+    stats = users.values('pk').annotate(
+        **{'real_' + name: value for name, value in actual.items()}
+    ).exclude(
+        **{'stats__' + name: F('real_' + name) for name in actual}
+    )
+    fixed = len(created)
+    for row in stats.iterator():
+        AuthorStats.objects.filter(user_id=row['pk']).update(
+            **{name: row['real_' + name] for name in actual}
+        )
+        fixed += 1
+    return fixed
+
+
+def reconcile_comments():
+    """Пересчитывает comments_count постов, возвращает число исправленных."""
+    posts = Post.objects.annotate(
+        real=_count(Comment.objects, 'post')
+    ).exclude(comments_count=F('real')).values_list('pk', 'real')
+    fixed = 0
+    for pk, real in posts.iterator():
+        Post.objects.filter(pk=pk).update(comments_count=real)
+        fixed += 1
+    return fixed
@@ -0,0 +1,94 @@
+import csv
+import datetime as dt
+import json
+
+from django.utils import timezone
+from django.utils.dateparse import parse_date, parse_datetime
+
+from .models import Post
+
+# Ключи совпадают с форматом команды import_content.
+FIELDS = ('id', 'text', 'author', 'group', 'pub_date', 'image',
+          'comments_count')
+COLUMNS = ('pk', 'text', 'author__username', 'group__slug', 'pub_date',
+           'image', 'comments_count')
+FORMATS = ('ndjson', 'csv')
+
+
+def parse_bound(value, end=False):
+    """Граница периода из даты или даты-времени в ISO 8601."""
+    if not value:
+        return None
+    moment = parse_datetime(value)
+    if moment is None:
+        day = parse_date(value)
+        if day is None:
+            raise ValueError(f'Некорректная дата: {value}')
+        moment = dt.datetime.combine(day, dt.time.max if end else dt.time.min)
+    if timezone.is_naive(moment):
+        moment = timezone.make_aware(moment)
+    return moment
+
+
+def export_queryset(group=None, author=None, since=None, until=None):
+    posts = Post.objects.all()
+    if group:
+        posts = posts.filter(group__slug=group)
+    if author:
+        posts = posts.filter(author__username=author)
+    if since:
+        posts = posts.filter(pub_date__gte=parse_bound(since))
+    if until:
+        posts = posts.filter(pub_date__lte=parse_bound(until, end=True))
+    return posts.values_list(*COLUMNS)
+
+
+def iter_rows(queryset, chunk_size=2000):
+    """Строки выборки кусками по pk: память не зависит от объёма."""
+    last = 0
+    while True:
+        rows = list(
+            queryset.filter(pk__gt=last).order_by('pk')[:chunk_size]
+        )
+        yield from rows
+        if len(rows) < chunk_size:
+            return
+        last = rows[-1][0]
+
+
+def _default(value):
+    if isinstance(value, (dt.datetime, dt.date)):
+        return value.isoformat()
+    return str(value)
+
+
+def ndjson_lines(rows):
+    encode = json.JSONEncoder(
+        ensure_ascii=False, separators=(',', ':'), default=_default
+    ).encode
+    for row in rows:
+        yield encode(dict(zip(FIELDS, row))) + '\n'
+
+
+class _Line:
+    """Файл для csv.writer, который просто возвращает записанное."""
+
+    def write(self, value):
+        return value
+
+
+def csv_lines(rows):
+    writer = csv.writer(_Line())
+    yield writer.writerow(FIELDS)
+    for row in rows:
+        yield writer.writerow(
+            value.isoformat() if isinstance(value, dt.datetime) else value
+            for value in row
+        )
+
+
+def export_lines(file_format, chunk_size=2000, **filters):
+    rows = iter_rows(export_queryset(**filters), chunk_size)
+    if file_format == 'csv':
+        return csv_lines(rows)
+    return ndjson_lines(rows)
@@ -0,0 +1,127 @@
+from django.conf import settings
+from django.db.models import Q
+
+from .models import AuthorStats, FeedEntry, Follow, Post
+from .utils import paginate_page
+
+
+def large_authors(user):
+    """id авторов из подписок user, ленты которых не раздаются при записи.
+
+    У крупных авторов слишком много подписчиков, поэтому их посты
+    подмешиваются в ленту при чтении, а не копируются каждому. Режим
+    хранится в AuthorStats.fanout (см. update_mode), а не считается по
+    текущему числу подписчиков: иначе посты пропадали бы из ленты в
+    момент пересечения порога.
+    """
+    return list(
+        Follow.objects.filter(
+            user=user, author__stats__fanout=False
+        ).values_list('author', flat=True)
+    )
+
+
+def is_large_author(author_id):
+    return AuthorStats.objects.filter(
+        user_id=author_id, fanout=False
+    ).exists()
+
+
+def fan_out(post):
+    """Кладёт новый пост в ленты подписчиков автора."""
+    if is_large_author(post.author_id):
+        return
+    followers = Follow.objects.filter(
+        author_id=post.author_id
+    ).values_list('user', flat=True)
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post_id=post.pk,
+                   author_id=post.author_id, pub_date=post.pub_date)
+         for user_id in followers.iterator()),
+        ignore_conflicts=True
+    )
+
+
+def fill(author_id, user_ids):
+    """Кладёт последние FEED_BACKFILL_SIZE постов автора в ленты user_ids.
+
+    Более старые посты в ленту не попадают: лента - это свежие посты,
+    вся история автора - в его профиле.
+    """
+    posts = list(Post.objects.filter(
+        author_id=author_id
+    ).order_by('-pub_date', '-pk').values_list(
+        'pk', 'pub_date'
+    )[:settings.FEED_BACKFILL_SIZE])
+    FeedEntry.objects.bulk_create(
+        (FeedEntry(user_id=user_id, post_id=post_id,
+                   author_id=author_id, pub_date=pub_date)
+         for user_id in user_ids for post_id, pub_date in posts),
+        ignore_conflicts=True
+    )
+
+
+def backfill(follow):
+    """Заполняет ленту последними постами автора после подписки."""
+    if is_large_author(follow.author_id):
+        return
+    fill(follow.author_id, [follow.user_id])
+
+
+def update_mode(author_id):
+    """Переключает раздачу постов автора, когда подписчиков стало
+    не меньше FEED_FANOUT_LIMIT или меньше FEED_FANOUT_RESUME.
+
+    Флаг меняется условным UPDATE, поэтому строки лент переносит один
+    процесс. Сначала меняется флаг, потом строки: новые посты уже идут
+    по новому режиму, а ignore_conflicts прощает повторную раздачу.
+    """
+    stats = AuthorStats.objects.filter(user_id=author_id).values_list(
+        'followers_count', 'fanout'
+    ).first()
+    if stats is None:
+        return
+    followers_count, fanout = stats
+    if fanout and followers_count >= settings.FEED_FANOUT_LIMIT:
+        if AuthorStats.objects.filter(
+            user_id=author_id, fanout=True
+        ).update(fanout=False):
+            # Посты автора теперь читаются запросом к Post.
+            FeedEntry.objects.filter(author_id=author_id).delete()
+    elif not fanout and followers_count < settings.FEED_FANOUT_RESUME:
+        if AuthorStats.objects.filter(
+            user_id=author_id, fanout=False
+        ).update(fanout=True):
+            followers = Follow.objects.filter(
+                author_id=author_id
+            ).values_list('user', flat=True)
+            fill(author_id, list(followers))
+
+
+def prune(follow):
+    """Убирает посты автора из ленты после отписки."""
+    FeedEntry.objects.filter(
+        user_id=follow.user_id, author_id=follow.author_id
+    ).delete()
+
+
+def follow_feed_page(request):
+    """Страница ленты подписок текущего пользователя.
+
+    Обычно это одно чтение диапазона по индексу ленты. Если среди
+    подписок есть крупные авторы, их посты добавляются запросом к Post.
+    """
+    user = request.user
+    large = large_authors(user)
+    if large:
+        posts = Post.objects.filter(
+            Q(pk__in=FeedEntry.objects.filter(user=user).values('post'))
+            | Q(author__in=large)
+        ).select_related('author', 'group').prefetch_related('renditions')
+        return paginate_page(request, posts)
+    entries = FeedEntry.objects.filter(user=user).select_related(
+        'post__author', 'post__group'
+    ).prefetch_related('post__renditions')
+    page = paginate_page(request, entries, ordering=('-pub_date', '-post_id'))
+    page.object_list = [entry.post for entry in page.object_list]
+    return page
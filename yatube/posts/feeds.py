@@ -0,0 +1,166 @@
+import hashlib
+
+from django.conf import settings
+from django.contrib.syndication.views import Feed
+from django.core.cache import cache
+from django.http import HttpResponse
+from django.shortcuts import get_object_or_404
+from django.urls import reverse
+from django.utils.cache import get_conditional_response
+from django.utils.feedgenerator import Atom1Feed
+from django.utils.http import http_date, parse_http_date_safe
+from django.utils.text import Truncator
+
+from .cache import generation
+from .models import Group, Post, User
+
+
+class LatestPostsFeed(Feed):
+    """Последние посты сайта."""
+    title = 'Yatube: последние записи'
+    description = 'Новые записи всех авторов'
+
+    def link(self):
+        return reverse('posts:index')
+
+    def scope(self, obj):
+        """Поколение кеша, которое меняется вместе с лентой."""
+        return ('index',)
+
+    def posts(self, obj):
+        return Post.objects.all()
+
+    def items(self, obj):
+        return self.posts(obj).select_related(
+            'author', 'group'
+        ).order_by('-pub_date', '-pk')[:settings.FEED_ITEMS]
+
+    def item_title(self, item):
+        return Truncator(item.text).words(10)
+
+    def item_description(self, item):
+        return item.text
+
+    def item_link(self, item):
+        return reverse('posts:post_detail', args=[item.pk])
+
+    def item_pubdate(self, item):
+        return item.pub_date
+
+    def item_updateddate(self, item):
+        return item.updated_at
+
+    def item_author_name(self, item):
+        return item.author.get_full_name() or item.author.username
+
+    def item_categories(self, item):
+        return [item.group.title] if item.group_id else []
+
+
+class GroupPostsFeed(LatestPostsFeed):
+    """Последние посты группы."""
+
+    def get_object(self, request, slug):
+        return get_object_or_404(Group, slug=slug)
+
+    def title(self, obj):
+        return f'Yatube: {obj.title}'
+
+    def description(self, obj):
+        return obj.description
+
+    def link(self, obj):
+        return reverse('posts:group_list', args=[obj.slug])
+
+    def scope(self, obj):
+        return ('group', obj.slug)
+
+    def posts(self, obj):
+        return obj.posts.all()
+
+
+class AuthorPostsFeed(LatestPostsFeed):
+    """Последние посты автора."""
+
+    def get_object(self, request, username):
+        return get_object_or_404(User, username=username)
+
+    def title(self, obj):
+        return f'Yatube: {obj.get_full_name() or obj.username}'
+
+    def description(self, obj):
+        return f'Записи пользователя {obj.username}'
+
+    def link(self, obj):
+        return reverse('posts:profile', args=[obj.username])
+
+    def scope(self, obj):
+        return ('author', obj.username)
+
+    def posts(self, obj):
+        return obj.posts.all()
+
+
+class LatestPostsAtomFeed(LatestPostsFeed):
+    feed_type = Atom1Feed
+    subtitle = LatestPostsFeed.description
+
+
+class GroupPostsAtomFeed(GroupPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+class AuthorPostsAtomFeed(AuthorPostsFeed):
+    feed_type = Atom1Feed
+
+    def subtitle(self, obj):
+        return self.description(obj)
+
+
+def cached_feed(feed_class):
+    """View ленты с кешем тела и условным GET.
+
+    Тело хранится под ключом с поколением списка, поэтому новый или
+    изменённый пост сам делает старую копию ненужной. В ключ входят
+    и хост со схемой: ссылки в теле абсолютные. ETag выводится из
+    того же ключа, так что клиент с актуальной копией получает 304
+    без повторной сборки XML. Last-Modified - время самой свежей
+    публикации или правки среди постов ленты.
+    """
+    feed = feed_class()
+
+    def view(request, **kwargs):
+        obj = feed.get_object(request, **kwargs)
+        scope = feed.scope(obj)
+        version = generation(*scope)
+        parts = [
+            feed_class.__name__, request.scheme, request.get_host(),
+            *scope, version
+        ]
+        tag = hashlib.md5(
+            ':'.join(str(part) for part in parts).encode()
+        ).hexdigest()
+        etag = f'"{tag}"'
+        key = 'feed:' + tag
+        entry = cache.get(key)
+        if entry is None:
+            response = feed(request, **kwargs)
+            # Feed ставит Last-Modified по latest_post_date() пунктов.
+            entry = (
+                response.content, response['Content-Type'],
+                parse_http_date_safe(response['Last-Modified']),
+            )
+            cache.set(key, entry, settings.CACHES_TIME)
+        content, content_type, last_modified = entry
+        response = HttpResponse(content, content_type=content_type)
+        response['ETag'] = etag
+        response['Last-Modified'] = http_date(last_modified)
+        return get_conditional_response(
+            request, etag=etag, last_modified=last_modified,
+            response=response
+        )
+
+    return view
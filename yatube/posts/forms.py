@@ -1,5 +1,6 @@
 from django.forms import ModelForm
 from .models import Post, Comment
+from . import renditions
 
 
 class PostForm(ModelForm):
@@ -11,6 +12,16 @@ class PostForm(ModelForm):
             'group': 'Группа, к которой будет относиться пост'
         }
 
+    def save(self, commit=True):
+        if 'image' in self.changed_data:
+            image = self.cleaned_data.get('image')
+            self.instance.set_image_meta(
+                renditions.read_meta(image) if image else None
+            )
+        # Миниатюры ставит в очередь сигнал сохранения поста.
+        return super().save(commit)
+
+
 class CommentForm(ModelForm):
     class Meta:
         model = Comment
@@ -0,0 +1,32 @@
+from django.core.management.base import BaseCommand
+
+from posts.models import Post
+from posts.renditions import read_meta
+
+
+class Command(BaseCommand):
+    help = 'Заполняет размеры, формат и хеш картинок уже созданных постов.'
+
+    def handle(self, *args, **options):
+        posts = Post.objects.exclude(image='').filter(image_hash='')
+        done = failed = 0
+        for post in posts.only('pk', 'image').iterator():
+            try:
+                with post.image.open('rb') as file:
+                    meta = read_meta(file)
+            except (OSError, ValueError):
+                failed += 1
+                self.stderr.write(f'Не удалось прочитать {post.image.name}')
+                continue
+            post.set_image_meta(meta)
+            Post.objects.filter(pk=post.pk).update(
+                image_width=post.image_width,
+                image_height=post.image_height,
+                image_size=post.image_size,
+                image_format=post.image_format,
+                image_hash=post.image_hash,
+            )
+            done += 1
+        self.stdout.write(self.style.SUCCESS(
+            f'Заполнено: {done}, с ошибками: {failed}'
+        ))
@@ -0,0 +1,117 @@
+import json
+import os
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from posts import benchmark
+
+BASELINE = os.path.join(settings.BASE_DIR, 'benchmarks', 'baseline.json')
+
+
+class Command(BaseCommand):
+    help = ('Замеряет index, group_posts, profile, post_detail и '
+            'follow_index на текущей базе и сравнивает с базовым замером.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--requests', type=int, default=50,
+            help='Замеряемых запросов на страницу и глубину.'
+        )
+        parser.add_argument('--warmup', type=int, default=5)
+        parser.add_argument(
+            '--depths', default='1,5,20',
+            help='Глубины курсорной пагинации через запятую.'
+        )
+        parser.add_argument(
+            '--cold', action='store_true',
+            help='Очищать кеш перед каждым запросом.'
+        )
+        parser.add_argument('--output', help='Куда записать JSON замера.')
+        parser.add_argument('--baseline', default=BASELINE)
+        parser.add_argument(
+            '--threshold', type=float, default=0.25,
+            help='Допустимый рост времени и памяти (0.25 = 25%%); '
+                 'число запросов расти не должно вовсе.'
+        )
+        parser.add_argument(
+            '--save-baseline', action='store_true',
+            help='Записать замер как новый базовый.'
+        )
+
+    def handle(self, *args, **options):
+        depths = tuple(
+            int(depth) for depth in options['depths'].split(',') if depth
+        )
+        # Эталон меряется до и после: загрузка машины могла измениться.
+        calibration = benchmark.calibrate()
+        try:
+            results = benchmark.run(
+                options['requests'], options['warmup'], depths,
+                options['cold']
+            )
+        except ValueError as error:
+            raise CommandError(error)
+        calibration = (calibration + benchmark.calibrate()) / 2
+        report = {
+            'calibration_ms': round(calibration, 3),
+            'dataset': benchmark.dataset(),
+            'options': {
+                'requests': options['requests'],
+                'depths': depths,
+                'cold': options['cold'],
+            },
+            'results': results,
+        }
+        for key, metrics in sorted(results.items()):
+            self.stdout.write(
+                f'{key:<18} p50 {metrics["p50_ms"]:>8.2f} мс  '
+                f'p95 {metrics["p95_ms"]:>8.2f} мс  '
+                f'p99 {metrics["p99_ms"]:>8.2f} мс  '
+                f'{metrics["rps"]:>7.1f} rps  '
+                f'{metrics["queries"]:>3} запросов  '
+                f'{metrics["peak_kb"]:>8.1f} КБ'
+            )
+        if options['output']:
+            self.write(options['output'], report)
+        if options['save_baseline']:
+            self.write(options['baseline'], report)
+            self.stdout.write(self.style.SUCCESS(
+                f'Базовый замер сохранён в {options["baseline"]}'
+            ))
+            return
+        self.check_baseline(report, options['baseline'],
+                            options['threshold'])
+
+    def write(self, path, report):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        with open(path, 'w', encoding='utf-8') as file:
+            json.dump(report, file, ensure_ascii=False, indent=2)
+            file.write('\n')
+
+    def check_baseline(self, report, path, threshold):
+        if not os.path.exists(path):
+            self.stdout.write(
+                f'Базового замера {path} нет, сравнение пропущено'
+            )
+            return
+        with open(path, encoding='utf-8') as file:
+            baseline = json.load(file)
+        if baseline.get('dataset') != report['dataset']:
+            self.stdout.write(self.style.WARNING(
+                'Объём данных отличается от базового замера: '
+                f'{baseline.get("dataset")}'
+            ))
+        speed = 1.0
+        if baseline.get('calibration_ms'):
+            speed = report['calibration_ms'] / baseline['calibration_ms']
+            self.stdout.write(f'Поправка на скорость машины: {speed:.2f}')
+        regressions = benchmark.compare(
+            report['results'], baseline.get('results', {}), threshold, speed
+        )
+        if regressions:
+            raise CommandError(
+                'Регрессии относительно базового замера:\n'
+                + '\n'.join(regressions)
+            )
+        self.stdout.write(self.style.SUCCESS('Регрессий нет'))
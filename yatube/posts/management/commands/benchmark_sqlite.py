@@ -0,0 +1,175 @@
+import multiprocessing
+import os
+import random
+import sqlite3
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection, models
+
+from core.db import pragma_statements
+from posts.benchmark import percentile
+from posts.models import Post, User
+
+
+def worker(path, role, seconds, start_at, pragmas, persistent, queries):
+    """Процесс-читатель или писатель; возвращает (успехи, ошибки, задержки).
+
+    Без persistent соединение открывается на каждую операцию, как
+    при CONN_MAX_AGE = 0.
+    """
+    read_sql, (write_sql, defaults), author_ids = queries
+    rng = random.Random(os.getpid())
+    done = errors = 0
+    latencies = []
+    db = None
+    while time.time() < start_at:
+        time.sleep(0.001)
+    deadline = start_at + seconds
+    while time.time() < deadline:
+        started = time.perf_counter()
+        try:
+            if db is None:
+                db = sqlite3.connect(path)
+                for statement in pragma_statements(pragmas):
+                    db.execute(statement)
+            if role == 'read':
+                db.execute(read_sql).fetchall()
+            else:
+                with db:
+                    db.execute(write_sql, {
+                        **defaults,
+                        'text': f'Текст {rng.random()}',
+                        'author_id': rng.choice(author_ids),
+                    })
+            done += 1
+        except (sqlite3.OperationalError, sqlite3.IntegrityError):
+            # Занятая база или нарушенное ограничение считаются ошибкой
+            # операции, а не роняют процесс вместе со всем замером.
+            errors += 1
+        finally:
+            if db is not None and not persistent:
+                db.close()
+                db = None
+        latencies.append(time.perf_counter() - started)
+    if db is not None:
+        db.close()
+    return done, errors, latencies
+
+
+class Command(BaseCommand):
+    help = ('Сравнивает параллельные чтение и запись в копии базы SQLite '
+            'с настройками по умолчанию и с SQLITE_PRAGMAS и '
+            'постоянными соединениями.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--readers', type=int, default=4)
+        parser.add_argument('--writers', type=int, default=2)
+        parser.add_argument('--seconds', type=float, default=5)
+
+    def handle(self, *args, **options):
+        if connection.vendor != 'sqlite':
+            raise CommandError('Замер имеет смысл только для SQLite')
+        author_ids = list(User.objects.values_list('pk', flat=True)[:1000])
+        if not author_ids:
+            raise CommandError('База пуста: сначала выполните manage.py seed')
+        queries = (self.read_sql(), self.write_sql(), author_ids)
+        modes = [
+            ('по умолчанию', {'journal_mode': 'delete'}, False),
+            ('SQLITE_PRAGMAS', settings.SQLITE_PRAGMAS, True),
+        ]
+        results = {}
+        with tempfile.TemporaryDirectory() as directory:
+            for title, pragmas, persistent in modes:
+                path = os.path.join(directory, 'bench.sqlite3')
+                self.copy_database(path, pragmas)
+                results[title] = self.run(
+                    path, pragmas, persistent, queries, options
+                )
+                for suffix in ('', '-wal', '-shm'):
+                    if os.path.exists(path + suffix):
+                        os.remove(path + suffix)
+        for title, (reads, writes, errors, p95) in results.items():
+            self.stdout.write(
+                f'{title:<16} чтений {reads:>8.0f}/с  '
+                f'записей {writes:>7.0f}/с  ошибок {errors:>5}  '
+                f'p95 чтения {p95:>7.2f} мс'
+            )
+        (base, *_), (tuned, *_) = results.values()
+        self.stdout.write(self.style.SUCCESS(
+            f'Чтения быстрее в {tuned / max(base, 1e-9):.1f} раза'
+        ))
+
+    def read_sql(self):
+        """Запрос главной страницы: последние посты с авторами."""
+        posts = Post.objects.select_related('author', 'group').order_by(
+            '-pub_date', '-pk'
+        )[:settings.POSTS_PER_PAGE]
+        sql, params = posts.query.sql_with_params()
+        if params:
+            raise CommandError('Запрос чтения не должен иметь параметров')
+        return sql
+
+    def write_sql(self):
+        """INSERT поста по всем столбцам модели и значения по умолчанию.
+
+        Запрос собирается из Post._meta, поэтому новые NOT NULL поля
+        не ломают замер. text и author_id подставляет процесс-писатель,
+        даты - момент вставки, остальное - значения по умолчанию поля.
+        """
+        table = Post._meta.db_table
+        columns, values, defaults = [], [], {}
+        for field in Post._meta.concrete_fields:
+            if field.primary_key:
+                continue
+            columns.append(field.column)
+            if isinstance(field, models.DateTimeField):
+                values.append("datetime('now')")
+                continue
+            values.append(f':{field.column}')
+            if field.column not in ('text', 'author_id'):
+                defaults[field.column] = field.get_db_prep_save(
+                    field.get_default(), connection
+                )
+        sql = (
+            f'INSERT INTO {table} ({", ".join(columns)}) '
+            f'VALUES ({", ".join(values)})'
+        )
+        return sql, defaults
+
+    def copy_database(self, path, pragmas):
+        """Копия базы: замер не должен менять рабочий файл и его режим."""
+        source = sqlite3.connect(settings.DATABASES['default']['NAME'])
+        target = sqlite3.connect(path)
+        try:
+            source.backup(target)
+            journal_mode = pragmas.get('journal_mode', 'delete')
+            target.execute(f'PRAGMA journal_mode = {journal_mode}')
+        finally:
+            source.close()
+            target.close()
+
+    def run(self, path, pragmas, persistent, queries, options):
+        roles = (['read'] * options['readers']
+                 + ['write'] * options['writers'])
+        start_at = time.time() + 1
+        # fork: дочерним процессам не нужно заново настраивать Django,
+        # они работают только через модуль sqlite3.
+        context = multiprocessing.get_context('fork')
+        with context.Pool(len(roles)) as pool:
+            outcomes = pool.starmap(worker, [
+                (path, role, options['seconds'], start_at, pragmas,
+                 persistent, queries)
+                for role in roles
+            ])
+        reads = [o for role, o in zip(roles, outcomes) if role == 'read']
+        writes = [o for role, o in zip(roles, outcomes) if role == 'write']
+        latencies = [value for _, _, values in reads for value in values]
+        return (
+            sum(done for done, _, _ in reads) / options['seconds'],
+            sum(done for done, _, _ in writes) / options['seconds'],
+            sum(errors for _, errors, _ in reads + writes),
+            percentile(latencies, 0.95) * 1000 if latencies else 0,
+        )
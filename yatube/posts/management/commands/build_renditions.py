@@ -0,0 +1,57 @@
+from concurrent.futures import ThreadPoolExecutor
+
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+from posts.models import Post
+from posts.thumbnails import generate
+
+
+def _generate(post_id):
+    """id поста, если его картинку не удалось обработать."""
+    try:
+        generate(post_id)
+    except (OSError, ValueError):
+        return post_id
+    return None
+
+
+def _generate_in_thread(post_id):
+    try:
+        return _generate(post_id)
+    finally:
+        connections.close_all()
+
+
+class Command(BaseCommand):
+    help = ('Строит варианты картинок для постов с файлами '
+            'в MEDIA_ROOT/posts/.')
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--force', action='store_true',
+            help='Пересобрать варианты и для постов, где они уже есть.'
+        )
+        parser.add_argument(
+            '--workers', type=int, default=1,
+            help='Сколько картинок обрабатывать одновременно.'
+        )
+
+    def handle(self, *args, **options):
+        posts = Post.objects.filter(image__startswith='posts/')
+        if not options['force']:
+            posts = posts.filter(renditions__isnull=True)
+        post_ids = list(posts.values_list('pk', flat=True).distinct())
+        if options['workers'] > 1:
+            with ThreadPoolExecutor(options['workers']) as pool:
+                results = list(pool.map(_generate_in_thread, post_ids))
+        else:
+            results = [_generate(post_id) for post_id in post_ids]
+        failed = [post_id for post_id in results if post_id is not None]
+        if failed:
+            self.stderr.write(
+                f'Не удалось прочитать картинки постов: {failed}'
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Обработано картинок: {len(post_ids) - len(failed)}'
+        ))
@@ -0,0 +1,35 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from posts.export import FORMATS, export_lines
+
+
+class Command(BaseCommand):
+    help = 'Потоковая выгрузка постов в NDJSON или CSV.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=FORMATS, default='ndjson')
+        parser.add_argument('--group', help='Слаг группы.')
+        parser.add_argument('--author', help='Имя пользователя автора.')
+        parser.add_argument('--since', help='Начало периода (ISO 8601).')
+        parser.add_argument('--until', help='Конец периода (ISO 8601).')
+        parser.add_argument('--chunk-size', type=int, default=2000)
+        parser.add_argument(
+            '--output', help='Файл для выгрузки (по умолчанию stdout).'
+        )
+
+    def handle(self, *args, **options):
+        try:
+            lines = export_lines(
+                options['format'], options['chunk_size'],
+                group=options['group'], author=options['author'],
+                since=options['since'], until=options['until'],
+            )
+            if options['output']:
+                with open(options['output'], 'w', encoding='utf-8',
+                          newline='') as file:
+                    file.writelines(lines)
+            else:
+                for line in lines:
+                    self.stdout.write(line, ending='')
+        except ValueError as error:
+            raise CommandError(error)
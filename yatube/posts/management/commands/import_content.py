@@ -0,0 +1,245 @@
+import csv
+import json
+import os
+import time
+from itertools import islice
+
+from django.contrib.auth.hashers import make_password
+from django.core.management import call_command
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from django.utils.dateparse import parse_datetime
+
+from posts import bulk
+from posts.models import Comment, Group, Post, User
+
+
+def read_records(path, file_format, skip=0):
+    """Записи файла по одной: в памяти только текущая строка.
+
+    Первые skip записей (уже импортированных) пропускаются; строки
+    JSON Lines при этом даже не разбираются.
+    """
+    with open(path, encoding='utf-8', newline='') as file:
+        if file_format == 'csv':
+            yield from islice(csv.DictReader(file), skip, None)
+            return
+        lines = (line for line in file if line.strip())
+        for line in islice(lines, skip, None):
+            yield json.loads(line)
+
+
+class Lookup:
+    """Кеш «ключ -> id» с догрузкой промахов одним запросом на пачку."""
+
+    def __init__(self, queryset, field, limit=200_000):
+        self.queryset = queryset
+        self.field = field
+        self.limit = limit
+        self.ids = {}
+
+    def load(self, keys):
+        missing = {key for key in keys if key and key not in self.ids}
+        if not missing:
+            return
+        if len(self.ids) + len(missing) > self.limit:
+            self.ids.clear()
+        for chunk in bulk.batched(missing, bulk.IN_CHUNK):
+            self.ids.update(
+                self.queryset.filter(**{f'{self.field}__in': chunk})
+                .values_list(self.field, 'pk')
+            )
+
+    def get(self, key):
+        return self.ids.get(key)
+
+
+MODELS = {'group': Group, 'post': Post, 'comment': Comment}
+
+
+class Command(BaseCommand):
+    help = ('Потоковый импорт групп, постов или комментариев из JSON Lines '
+            'или CSV пачками через bulk_create с возможностью продолжить '
+            'с контрольной точки.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument(
+            '--kind', choices=('group', 'post', 'comment'), required=True,
+            help='Что лежит в файле.'
+        )
+        parser.add_argument(
+            '--format', choices=('jsonl', 'csv'),
+            help='Формат файла; по умолчанию - по расширению.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--checkpoint',
+            help='Файл контрольной точки (по умолчанию <path>.checkpoint).'
+        )
+        parser.add_argument(
+            '--create-authors', action='store_true',
+            help='Создавать неизвестных авторов без пароля.'
+        )
+
+    def handle(self, *args, **options):
+        path = options['path']
+        if not os.path.exists(path):
+            raise CommandError(f'Файл {path} не найден')
+        file_format = options['format'] or (
+            'csv' if path.endswith('.csv') else 'jsonl'
+        )
+        self.checkpoint = options['checkpoint'] or path + '.checkpoint'
+        self.create_authors = options['create_authors']
+        self.authors = Lookup(User.objects, 'username')
+        self.groups = Lookup(Group.objects, 'slug')
+        self.model = MODELS[options['kind']]
+        self.with_images = False
+        self.skipped = 0
+
+        done = self.read_checkpoint()
+        resumed = done > 0
+        records = read_records(path, file_format, skip=done)
+        insert = getattr(self, f'insert_{options["kind"]}s')
+        started = time.monotonic()
+        imported = 0
+        for batch in bulk.batched(records, options['batch_size']):
+            self.touched_authors = set()
+            self.touched_groups = set()
+            with transaction.atomic(), bulk.explicit_dates(
+                Post, 'pub_date'
+            ), bulk.explicit_dates(Comment, 'created'):
+                mark = self.last_pk()
+                imported += insert(batch)
+                # Ленты и списки обновляются в той же транзакции, что и
+                # пачка: после падения не остаётся постов без раздачи.
+                if self.touched_authors:
+                    bulk.refresh_feeds(self.touched_authors)
+                bulk.refresh_lists(self.touched_authors, self.touched_groups)
+                self.write_checkpoint(done, done + len(batch), mark)
+            done += len(batch)
+            self.write_checkpoint(done)
+            rate = imported / max(time.monotonic() - started, 1e-6)
+            self.stdout.write(
+                f'{done} записей обработано, {imported} добавлено, '
+                f'{rate:.0f} записей/с'
+            )
+        if self.with_images or (resumed and self.model is Post):
+            # bulk_create обходит сигнал, который ставит миниатюры; после
+            # возобновления картинки могли остаться и в прошлых пачках.
+            call_command(
+                'build_renditions', stdout=self.stdout, stderr=self.stderr
+            )
+        self.stdout.write(self.style.SUCCESS(
+            f'Готово: добавлено {imported}, пропущено {self.skipped}'
+        ))
+
+    def last_pk(self):
+        return self.model.objects.aggregate(last=Max('pk'))['last'] or 0
+
+    def read_checkpoint(self):
+        """Сколько записей файла уже в базе.
+
+        Запись «было стало pk» делается внутри транзакции пачки: если
+        процесс упал до того, как её сменило итоговое «стало», пачка
+        считается импортированной, только когда в базе есть строки
+        новее pk.
+        """
+        if not os.path.exists(self.checkpoint):
+            return 0
+        with open(self.checkpoint) as file:
+            parts = [int(part) for part in file.read().split()] or [0]
+        if len(parts) == 1:
+            return parts[0]
+        before, after, mark = parts
+        if self.model.objects.filter(pk__gt=mark).exists():
+            return after
+        return before
+
+    def write_checkpoint(self, *parts):
+        temporary = self.checkpoint + '.tmp'
+        with open(temporary, 'w') as file:
+            file.write(' '.join(map(str, parts)))
+        os.replace(temporary, self.checkpoint)
+
+    def date(self, value):
+        return (parse_datetime(value) if value else None) or timezone.now()
+
+    def resolve_authors(self, batch):
+        usernames = {record.get('author') for record in batch}
+        self.authors.load(usernames)
+        unknown = [name for name in usernames
+                   if name and self.authors.get(name) is None]
+        if unknown and self.create_authors:
+            password = make_password(None)
+            User.objects.bulk_create(
+                (User(username=name, password=password) for name in unknown),
+                ignore_conflicts=True
+            )
+            self.authors.load(unknown)
+
+    def insert_groups(self, batch):
+        groups = [
+            Group(slug=record['slug'], title=record.get('title', ''),
+                  description=record.get('description', ''))
+            for record in batch
+        ]
+        Group.objects.bulk_create(groups, ignore_conflicts=True)
+        self.touched_groups.update(
+            Group.objects.filter(
+                slug__in=[group.slug for group in groups]
+            ).values_list('pk', flat=True)
+        )
+        return len(groups)
+
+    def insert_posts(self, batch):
+        self.resolve_authors(batch)
+        self.groups.load(record.get('group') for record in batch)
+        posts = []
+        for record in batch:
+            author_id = self.authors.get(record.get('author'))
+            if author_id is None:
+                self.skipped += 1
+                continue
+            posts.append(Post(
+                text=record.get('text', ''),
+                author_id=author_id,
+                group_id=self.groups.get(record.get('group')),
+                pub_date=self.date(record.get('pub_date')),
+                image=record.get('image') or '',
+            ))
+        Post.objects.bulk_create(posts)
+        self.with_images |= any(post.image for post in posts)
+        self.touched_authors.update(bulk.posts_inserted(posts))
+        self.touched_groups.update(
+            post.group_id for post in posts if post.group_id
+        )
+        return len(posts)
+
+    def insert_comments(self, batch):
+        self.resolve_authors(batch)
+        post_ids = set()
+        for chunk in bulk.batched(
+            {int(record['post']) for record in batch}, bulk.IN_CHUNK
+        ):
+            post_ids.update(
+                Post.objects.filter(pk__in=chunk).values_list('pk', flat=True)
+            )
+        comments = []
+        for record in batch:
+            author_id = self.authors.get(record.get('author'))
+            post_id = int(record['post'])
+            if author_id is None or post_id not in post_ids:
+                self.skipped += 1
+                continue
+            comments.append(Comment(
+                text=record.get('text', ''),
+                post_id=post_id,
+                author_id=author_id,
+                created=self.date(record.get('created')),
+            ))
+        Comment.objects.bulk_create(comments)
+        bulk.comments_inserted(comments)
+        return len(comments)
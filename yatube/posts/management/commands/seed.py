@@ -0,0 +1,323 @@
+import heapq
+import random
+import time
+from collections import Counter, defaultdict
+from datetime import timedelta
+from io import BytesIO
+from itertools import accumulate
+
+from django.conf import settings
+from django.contrib.auth.hashers import make_password
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.db.models import Max
+from django.utils import timezone
+from faker import Faker
+from PIL import Image
+
+from posts import bulk, cache
+from posts.models import (
+    AuthorStats, Comment, FeedEntry, Follow, Group, Post, User
+)
+from posts.renditions import read_meta
+
+
+def zipf_weights(size, alpha, rng):
+    """Накопленные веса закона Ципфа, ранги перемешаны по id."""
+    ranks = list(range(1, size + 1))
+    rng.shuffle(ranks)
+    return list(accumulate(1 / rank ** alpha for rank in ranks))
+
+
+def heavy_tail(rng, mean, shape=2.0):
+    """Неотрицательное целое с хвостом Парето и средним около mean."""
+    return round((rng.paretovariate(shape) - 1) * mean * (shape - 1))
+
+
+class Command(BaseCommand):
+    help = ('Заполняет базу синтетическими данными для нагрузочных '
+            'замеров: граф подписок и активность авторов по степенному '
+            'закону, комментарии с тяжёлым хвостом, ленты подписок.')
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--groups', type=int, default=20)
+        parser.add_argument('--posts', type=int, default=20000)
+        parser.add_argument(
+            '--follows', type=float, default=20,
+            help='Среднее число подписок пользователя.'
+        )
+        parser.add_argument(
+            '--comments', type=float, default=3,
+            help='Среднее число комментариев к посту.'
+        )
+        parser.add_argument(
+            '--images', type=float, default=0.0,
+            help='Доля постов с картинкой (варианты картинок затем '
+                 'строит build_renditions).'
+        )
+        parser.add_argument(
+            '--grouped', type=float, default=0.7,
+            help='Доля постов в группах.'
+        )
+        parser.add_argument(
+            '--days', type=int, default=365,
+            help='За сколько дней распределяются даты постов.'
+        )
+        parser.add_argument(
+            '--alpha', type=float, default=1.1,
+            help='Показатель закона Ципфа для популярности авторов.'
+        )
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument(
+            '--prefix', default='seed',
+            help='Префикс имён пользователей и слагов групп.'
+        )
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument(
+            '--no-feeds', action='store_true',
+            help='Не заполнять ленты подписок.'
+        )
+
+    def handle(self, *args, **options):
+        self.options = options
+        self.prefix = options['prefix']
+        self.batch_size = options['batch_size']
+        if User.objects.filter(
+            username__startswith=f'{self.prefix}_user_'
+        ).exists():
+            raise CommandError(
+                f'Данные с префиксом {self.prefix} уже есть, '
+                f'укажите другой --prefix'
+            )
+        self.rng = random.Random(options['seed'])
+        self.fake = Faker('ru_RU')
+        self.fake.seed_instance(options['seed'])
+        self.words = sorted(set(self.fake.words(nb=3000)))
+        self.now = timezone.now()
+
+        self.users = self.stage('пользователи', self.create_users)
+        self.popularity = zipf_weights(
+            len(self.users), options['alpha'], self.rng
+        )
+        self.groups = self.stage('группы', self.create_groups)
+        self.stats = defaultdict(Counter)
+        self.stage('подписки', self.create_follows)
+        self.start_pk = Post.objects.aggregate(top=Max('pk'))['top'] or 0
+        self.stage('посты', self.create_posts)
+        self.newest = defaultdict(list)
+        self.stage('комментарии', self.create_comments)
+        if not options['no_feeds']:
+            self.stage('ленты', self.create_feeds)
+        self.stage('счётчики', self.create_stats)
+        cache.bump('index')
+        self.stdout.write(self.style.SUCCESS('Готово'))
+
+    def stage(self, title, step):
+        started = time.monotonic()
+        result = step()
+        rows = len(result) if isinstance(result, list) else result
+        elapsed = max(time.monotonic() - started, 1e-6)
+        self.stdout.write(
+            f'{title}: {rows} строк за {elapsed:.1f} с '
+            f'({rows / elapsed:.0f} строк/с)'
+        )
+        return result
+
+    def insert(self, model, objects, **kwargs):
+        total = 0
+        for batch in bulk.batched(objects, self.batch_size):
+            with transaction.atomic():
+                model.objects.bulk_create(batch, **kwargs)
+            total += len(batch)
+        return total
+
+    def text(self, low, high):
+        words = self.rng.choices(self.words, k=self.rng.randint(low, high))
+        return ' '.join(words).capitalize() + '.'
+
+    def popular_users(self, number):
+        return self.rng.choices(
+            self.users, cum_weights=self.popularity, k=number
+        )
+
+    def create_users(self):
+        password = make_password(None)
+        self.insert(User, (
+            User(
+                username=f'{self.prefix}_user_{num}',
+                first_name=self.fake.first_name(),
+                last_name=self.fake.last_name(),
+                password=password,
+            )
+            for num in range(self.options['users'])
+        ))
+        return list(
+            User.objects.filter(username__startswith=f'{self.prefix}_user_')
+            .order_by('pk').values_list('pk', flat=True)
+        )
+
+    def create_groups(self):
+        self.insert(Group, (
+            Group(
+                title=f'{self.fake.word().capitalize()} {num}',
+                slug=f'{self.prefix}-group-{num}',
+                description=self.text(5, 20),
+            )
+            for num in range(self.options['groups'])
+        ))
+        groups = list(
+            Group.objects.filter(slug__startswith=f'{self.prefix}-group-')
+            .order_by('pk').values_list('pk', flat=True)
+        )
+        self.group_weights = zipf_weights(
+            len(groups), self.options['alpha'], self.rng
+        ) if groups else None
+        return groups
+
+    def follows(self):
+        """Подписки: число - с тяжёлым хвостом, авторы - по популярности."""
+        others = len(self.users) - 1
+        for user_id in self.users:
+            number = min(heavy_tail(self.rng, self.options['follows']),
+                         others)
+            if number > others // 2:
+                # Почти все - быстрее выбрать без повторов сразу.
+                candidates = [pk for pk in self.users if pk != user_id]
+                authors = set(self.rng.sample(candidates, number))
+            else:
+                authors = set()
+                while len(authors) < number:
+                    authors.update(self.popular_users(number - len(authors)))
+                    authors.discard(user_id)
+            self.stats[user_id]['following_count'] = len(authors)
+            for author_id in authors:
+                self.stats[author_id]['followers_count'] += 1
+                yield Follow(user_id=user_id, author_id=author_id)
+
+    def create_follows(self):
+        return self.insert(Follow, self.follows())
+
+    def posts(self):
+        images = self.sample_images() if self.options['images'] else []
+        seconds = self.options['days'] * 24 * 60 * 60
+        left = self.options['posts']
+        while left:
+            number = min(left, self.batch_size)
+            left -= number
+            for author_id in self.popular_users(number):
+                self.stats[author_id]['posts_count'] += 1
+                group_id = None
+                if self.groups and self.rng.random() < self.options['grouped']:
+                    group_id = self.rng.choices(
+                        self.groups, cum_weights=self.group_weights
+                    )[0]
+                post = Post(
+                    author_id=author_id,
+                    group_id=group_id,
+                    text=self.text(5, 80),
+                    pub_date=self.now - timedelta(
+                        seconds=self.rng.uniform(0, seconds)
+                    ),
+                    comments_count=heavy_tail(
+                        self.rng, self.options['comments']
+                    ),
+                )
+                if images and self.rng.random() < self.options['images']:
+                    name, meta = self.rng.choice(images)
+                    post.image = name
+                    post.set_image_meta(meta)
+                yield post
+
+    def create_posts(self):
+        with bulk.explicit_dates(Post, 'pub_date'):
+            return self.insert(Post, self.posts())
+
+    def sample_images(self):
+        """Несколько картинок, общих для всех сгенерированных постов."""
+        images = []
+        for num in range(5):
+            color = tuple(self.rng.randrange(256) for _ in range(3))
+            content = BytesIO()
+            Image.new('RGB', (1280, 720), color).save(content, 'JPEG')
+            meta = read_meta(content)
+            name = default_storage.save(
+                f'posts/{self.prefix}_{num}.jpg',
+                ContentFile(content.getvalue())
+            )
+            images.append((name, meta))
+        return images
+
+    def new_posts(self):
+        """Созданные посты пачками по pk, не держа курсор при записи."""
+        last = self.start_pk
+        while True:
+            rows = list(
+                Post.objects.filter(pk__gt=last).order_by('pk').values_list(
+                    'pk', 'author_id', 'pub_date', 'comments_count'
+                )[:self.batch_size]
+            )
+            if not rows:
+                return
+            last = rows[-1][0]
+            yield rows
+
+    def comments(self):
+        size = settings.FEED_BACKFILL_SIZE
+        for rows in self.new_posts():
+            for post_id, author_id, pub_date, number in rows:
+                newest = self.newest[author_id]
+                if len(newest) < size:
+                    heapq.heappush(newest, (pub_date, post_id))
+                else:
+                    heapq.heappushpop(newest, (pub_date, post_id))
+                if not number:
+                    continue
+                age = (self.now - pub_date).total_seconds()
+                for commenter in self.popular_users(number):
+                    yield Comment(
+                        post_id=post_id,
+                        author_id=commenter,
+                        text=self.text(2, 30),
+                        created=pub_date + timedelta(
+                            seconds=self.rng.uniform(0, age)
+                        ),
+                    )
+
+    def create_comments(self):
+        with bulk.explicit_dates(Comment, 'created'):
+            return self.insert(Comment, self.comments())
+
+    def feed_entries(self):
+        """Ленты как после подписок: свежие посты некрупных авторов."""
+        limit = settings.FEED_FANOUT_LIMIT
+        for chunk in bulk.batched(self.users, bulk.IN_CHUNK):
+            follows = list(Follow.objects.filter(
+                user_id__in=chunk
+            ).values_list('user_id', 'author_id'))
+            for user_id, author_id in follows:
+                if self.stats[author_id]['followers_count'] >= limit:
+                    continue
+                for pub_date, post_id in self.newest[author_id]:
+                    yield FeedEntry(
+                        user_id=user_id, post_id=post_id,
+                        author_id=author_id, pub_date=pub_date
+                    )
+
+    def create_feeds(self):
+        return self.insert(
+            FeedEntry, self.feed_entries(), ignore_conflicts=True
+        )
+
+    def create_stats(self):
+        return self.insert(AuthorStats, (
+            AuthorStats(
+                user_id=user_id,
+                fanout=self.stats[user_id]['followers_count']
+                < settings.FEED_FANOUT_LIMIT,
+                **self.stats[user_id]
+            )
+            for user_id in self.users
+        ), ignore_conflicts=True)
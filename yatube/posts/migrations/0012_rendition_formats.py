@@ -0,0 +1,35 @@
+# Generated by Django 2.2.16 on 2026-10-18 05:59
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0011_rendition'),
+    ]
+
+    operations = [
+        migrations.AlterModelOptions(
+            name='rendition',
+            options={'verbose_name': 'Вариант картинки'},
+        ),
+        migrations.RemoveConstraint(
+            model_name='rendition',
+            name='unique_post_rendition',
+        ),
+        migrations.AddField(
+            model_name='rendition',
+            name='format',
+            field=models.CharField(default='jpeg', max_length=8, verbose_name='Формат'),
+        ),
+        migrations.AddField(
+            model_name='rendition',
+            name='path',
+            field=models.CharField(default='', max_length=255, verbose_name='Файл варианта'),
+        ),
+        migrations.AddConstraint(
+            model_name='rendition',
+            constraint=models.UniqueConstraint(fields=('post', 'name', 'format', 'width'), name='unique_post_rendition'),
+        ),
+    ]
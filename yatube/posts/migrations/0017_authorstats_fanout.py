@@ -0,0 +1,28 @@
+# Generated by Django 2.2.16 on 2026-10-18 06:54
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+def fill_fanout(apps, schema_editor):
+    """Крупные авторы и раньше читались при запросе ленты."""
+    AuthorStats = apps.get_model('posts', 'AuthorStats')
+    AuthorStats.objects.filter(
+        followers_count__gte=settings.FEED_FANOUT_LIMIT
+    ).update(fanout=False)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('posts', '0016_updated_at'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='authorstats',
+            name='fanout',
+            field=models.BooleanField(default=True, help_text='Меняется posts.feed.update_mode по числу подписчиков', verbose_name='Посты раздаются в ленты при записи'),
+        ),
+        migrations.RunPython(fill_fanout, migrations.RunPython.noop),
+    ]
@@ -3,6 +3,8 @@ from django.db import models
 # Create your models here.
 from django.contrib.auth import get_user_model
 
+from .renditions import Picture
+
 # Автоматически создаем таблицу для пользователя
 User = get_user_model()
 
@@ -37,6 +39,10 @@ class Post(models.Model):
         db_index=True,
         verbose_name='Дата публикации поста'
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения поста',
+        auto_now=True
+    )
     author = models.ForeignKey(
         User,
         on_delete=models.CASCADE,
@@ -58,14 +64,68 @@ class Post(models.Model):
         upload_to='posts/',
         blank=True
     )
+    # Сведения о картинке заполняет PostForm, чтобы при выводе
+    # не открывать файл (см. posts.renditions.read_meta).
+    image_width = models.PositiveIntegerField(
+        'Ширина картинки', null=True, blank=True, editable=False
+    )
+    image_height = models.PositiveIntegerField(
+        'Высота картинки', null=True, blank=True, editable=False
+    )
+    image_size = models.PositiveIntegerField(
+        'Размер файла картинки', null=True, blank=True, editable=False
+    )
+    image_format = models.CharField(
+        'Формат картинки', max_length=10, blank=True, editable=False
+    )
+    image_hash = models.CharField(
+        'SHA-256 картинки', max_length=64, blank=True, editable=False
+    )
+    comments_count = models.PositiveIntegerField(
+        'Количество комментариев',
+        default=0,
+        editable=False
+    )
 
     class Meta:
         ordering = ("-pub_date",)
         verbose_name = "Пост"
+        # Страницы автора и группы: фильтр по первому полю, порядок
+        # курсора (-pub_date, -id) - по остальным, без сортировки.
+        indexes = [
+            models.Index(fields=['author', '-pub_date', '-id'],
+                         name='post_author_pub_date_idx'),
+            models.Index(fields=['group', '-pub_date', '-id'],
+                         name='post_group_pub_date_idx'),
+        ]
 
     def __str__(self) -> str:
         return self.text[:15]
 
+    @property
+    def picture(self):
+        """Готовые варианты картинки для <picture> или None.
+
+        Берутся из prefetch_related('renditions'), поэтому шаблон
+        не обращается ни к диску, ни к хранилищу.
+        """
+        if not self.image:
+            return None
+        ready = [
+            rendition for rendition in self.renditions.all()
+            if rendition.source == self.image.name
+        ]
+        return Picture(ready) if ready else None
+
+    def set_image_meta(self, meta=None):
+        """Записывает сведения о картинке (или очищает их)."""
+        meta = meta or {}
+        self.image_width = meta.get('width')
+        self.image_height = meta.get('height')
+        self.image_size = meta.get('size')
+        self.image_format = meta.get('format', '')
+        self.image_hash = meta.get('hash', '')
+
 
 class Comment(models.Model):
     text = models.TextField(
@@ -78,6 +138,10 @@ class Comment(models.Model):
         auto_now_add=True,
         db_index=True
     )
+    updated_at = models.DateTimeField(
+        'Дата изменения комментария',
+        auto_now=True
+    )
     post = models.ForeignKey(
         Post,
         on_delete=models.CASCADE,
@@ -89,6 +153,14 @@ class Comment(models.Model):
         related_name='comments'
     )
 
+    class Meta:
+        ordering = ('created', 'pk')
+        indexes = [
+            models.Index(fields=['post', 'created'],
+                         name='comment_post_created_idx'),
+        ]
+
+
 class Follow(models.Model):
     user = models.ForeignKey(
         User,
@@ -106,3 +178,96 @@ class Follow(models.Model):
             models.UniqueConstraint(fields=['user', 'author'],
                                     name='unique_follows')
         ]
+        # Подписчики автора (раздача ленты, счётчики) читаются
+        # только из индекса, без обращения к таблице.
+        indexes = [
+            models.Index(fields=['author', 'user'],
+                         name='follow_author_user_idx'),
+        ]
+
+
+class Rendition(models.Model):
+    """Заранее подготовленный вариант картинки поста."""
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='renditions'
+    )
+    name = models.CharField('Вариант', max_length=32)
+    source = models.CharField('Исходный файл', max_length=255)
+    path = models.CharField('Файл варианта', max_length=255, default='')
+    url = models.CharField('Адрес', max_length=255)
+    format = models.CharField('Формат', max_length=8, default='jpeg')
+    width = models.PositiveIntegerField('Ширина')
+    height = models.PositiveIntegerField('Высота')
+
+    class Meta:
+        verbose_name = 'Вариант картинки'
+        constraints = [
+            models.UniqueConstraint(
+                fields=['post', 'name', 'format', 'width'],
+                name='unique_post_rendition'
+            )
+        ]
+
+    def __str__(self) -> str:
+        return f'{self.source} ({self.format}, {self.width}w)'
+
+
+class AuthorStats(models.Model):
+    """Денормализованные счётчики пользователя.
+
+    Обновляются сигналами (см. posts.counters), расхождения
+    исправляет команда reconcile_counters.
+    """
+    user = models.OneToOneField(
+        User,
+        on_delete=models.CASCADE,
+        primary_key=True,
+        related_name='stats'
+    )
+    posts_count = models.PositiveIntegerField('Постов', default=0)
+    followers_count = models.PositiveIntegerField('Подписчиков', default=0)
+    following_count = models.PositiveIntegerField('Подписок', default=0)
+    fanout = models.BooleanField(
+        'Посты раздаются в ленты при записи',
+        default=True,
+        help_text='Меняется posts.feed.update_mode по числу подписчиков'
+    )
+
+    class Meta:
+        verbose_name = 'Счётчики автора'
+
+    def __str__(self) -> str:
+        return str(self.user)
+
+
+class FeedEntry(models.Model):
+    """Строка материализованной ленты подписок пользователя."""
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    post = models.ForeignKey(
+        Post,
+        on_delete=models.CASCADE,
+        related_name='feed_entries'
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name='+'
+    )
+    pub_date = models.DateTimeField()
+
+    class Meta:
+        ordering = ('-pub_date', '-post')
+        indexes = [
+            models.Index(fields=['user', '-pub_date', '-post'],
+                         name='feed_user_pub_date_idx'),
+        ]
+        constraints = [
+            models.UniqueConstraint(fields=['user', 'post'],
+                                    name='unique_feed_entry')
+        ]
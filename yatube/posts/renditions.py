@@ -0,0 +1,114 @@
+import hashlib
+from io import BytesIO
+
+from PIL import Image, ImageOps
+
+WEBP = 'webp'
+
+
+def read_meta(file):
+    """Размеры, объём, формат и SHA-256 файла картинки."""
+    digest = hashlib.sha256()
+    size = 0
+    file.seek(0)
+    for chunk in iter(lambda: file.read(64 * 1024), b''):
+        digest.update(chunk)
+        size += len(chunk)
+    file.seek(0)
+    with Image.open(file) as image:
+        width, height = image.size
+        image_format = (image.format or '').lower()
+    file.seek(0)
+    return {
+        'width': width,
+        'height': height,
+        'size': size,
+        'format': image_format,
+        'hash': digest.hexdigest(),
+    }
+
+
+def fallback_format(source_format):
+    """Формат для браузеров без WebP: исходный, если он подходит."""
+    source_format = (source_format or '').lower()
+    if source_format in ('jpeg', 'mpo'):
+        return 'jpeg'
+    if source_format == 'webp':
+        return 'jpeg'
+    return 'png'
+
+
+def target_widths(source_width, widths):
+    """Ширины без увеличения исходника (но хотя бы одна)."""
+    widths = sorted(widths)
+    return [width for width in widths if width <= source_width] or widths[:1]
+
+
+def encode(image, image_format):
+    if image_format == 'jpeg' and image.mode != 'RGB':
+        image = image.convert('RGB')
+    elif image.mode not in ('RGB', 'RGBA'):
+        image = image.convert('RGBA')
+    buffer = BytesIO()
+    options = {'quality': 80} if image_format in ('jpeg', WEBP) else {}
+    image.save(buffer, image_format.upper(), optimize=True, **options)
+    return buffer.getvalue()
+
+
+def build(file, widths, size):
+    """Варианты картинки: (ширина, высота, формат, байты).
+
+    Картинка обрезается по центру до пропорций size и ужимается до
+    каждой ширины из widths; каждая ширина кодируется в WebP и
+    в формат для старых браузеров.
+    """
+    with Image.open(file) as source:
+        source.seek(0)
+        fallback = fallback_format(source.format)
+        image = ImageOps.exif_transpose(source)
+        aspect = size[1] / size[0]
+        for width in target_widths(image.width, widths):
+            height = max(1, round(width * aspect))
+            resized = ImageOps.fit(
+                image, (width, height), Image.LANCZOS, centering=(0.5, 0.5)
+            )
+            for image_format in (WEBP, fallback):
+                yield width, height, image_format, encode(
+                    resized, image_format
+                )
+
+
+class Picture:
+    """Набор вариантов одной картинки для <picture>/srcset."""
+    sizes = '(max-width: 960px) 100vw, 960px'
+
+    def __init__(self, renditions):
+        self.renditions = sorted(renditions, key=lambda item: item.width)
+        fallbacks = [
+            item for item in self.renditions if item.format != WEBP
+        ] or self.renditions
+        self.fallback = fallbacks[-1]
+
+    def _srcset(self, renditions):
+        return ', '.join(f'{item.url} {item.width}w' for item in renditions)
+
+    @property
+    def webp_srcset(self):
+        return self._srcset(
+            item for item in self.renditions if item.format == WEBP
+        )
+
+    @property
+    def fallback_srcset(self):
+        return self._srcset(
+            item for item in self.renditions
+            if item.format == self.fallback.format
+        )
+
+    @property
+    def width(self):
+        return self.fallback.width
+
+    @property
+    def height(self):
+        return self.fallback.height
@@ -0,0 +1,147 @@
+import re
+
+from django.conf import settings
+from django.db import connection
+from django.db.models import Q
+from django.db.models.expressions import RawSQL
+
+from .models import Post
+from .utils import KeysetPaginator, paginate_page
+
+FTS_TABLE = 'posts_post_fts'
+
+INSTALL_SQL = (
+    f"CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5("
+    f"text, content='posts_post', content_rowid='id', "
+    f"tokenize='unicode61 remove_diacritics 2')",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ai AFTER INSERT ON posts_post "
+    f"BEGIN INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); "
+    f"END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_ad AFTER DELETE ON posts_post "
+    f"BEGIN INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); END",
+    f"CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_au AFTER UPDATE OF text "
+    f"ON posts_post BEGIN "
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, text) "
+    f"VALUES ('delete', old.id, old.text); "
+    f"INSERT INTO {FTS_TABLE}(rowid, text) VALUES (new.id, new.text); END",
+)
+
+UNINSTALL_SQL = (
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ai',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_ad',
+    f'DROP TRIGGER IF EXISTS {FTS_TABLE}_au',
+    f'DROP TABLE IF EXISTS {FTS_TABLE}',
+)
+
+
+def is_available(using=connection):
+    return using.vendor == 'sqlite'
+
+
+def install(using=connection):
+    """Создаёт индекс FTS5 и триггеры, если их нет.
+
+    SQLite при изменении схемы пересоздаёт posts_post и теряет
+    триггеры, поэтому функция вызывается и после каждой миграции.
+    """
+    if not is_available(using):
+        return
+    with using.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master WHERE type = 'trigger' "
+            "AND name LIKE %s", [FTS_TABLE + '%']
+        )
+        complete = cursor.fetchone()[0] == 3
+        for statement in INSTALL_SQL:
+            cursor.execute(statement)
+        if not complete:
+            cursor.execute(
+                f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')"
+            )
+
+
+def uninstall(using=connection):
+    if not is_available(using):
+        return
+    with using.cursor() as cursor:
+        for statement in UNINSTALL_SQL:
+            cursor.execute(statement)
+
+
+def match_expression(text):
+    """Запрос пользователя в синтаксисе MATCH.
+
+    Каждое слово берётся в кавычки, чтобы операторы FTS5 из ввода
+    не ломали запрос; последнее слово ищется как префикс.
+    """
+    words = re.findall(r'\w+', text)
+    if not words:
+        return ''
+    terms = [f'"{word}"' for word in words]
+    terms[-1] += '*'
+    return ' '.join(terms)
+
+
+def matching_ids(match):
+    """Подзапрос id постов, подходящих под выражение MATCH."""
+    return RawSQL(
+        f'SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s', [match]
+    )
+
+
+class SearchPaginator(KeysetPaginator):
+    """Курсорная пагинация по релевантности bm25 и id поста."""
+
+    def __init__(self, match, per_page):
+        super().__init__(
+            Post.objects.select_related('author', 'group'), per_page,
+            ordering=('score', 'pk')
+        )
+        self.match = match
+
+    def parse_value(self, name, value):
+        return float(value) if name == 'score' else int(value)
+
+    def _fetch(self, values, backwards):
+        operator, order = ('<', 'DESC') if backwards else ('>', 'ASC')
+        sql = (
+            f'SELECT rowid AS post_id, bm25({FTS_TABLE}) AS score '
+            f'FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s'
+        )
+        params = [self.match]
+        if values is not None:
+            sql = (
+                f'SELECT post_id, score FROM ({sql}) '
+                f'WHERE score {operator} %s '
+                f'OR (score = %s AND post_id {operator} %s)'
+            )
+            params += [values[0], values[0], values[1]]
+        sql += f' ORDER BY score {order}, post_id {order} LIMIT %s'
+        params.append(self.per_page + 1)
+        with connection.cursor() as cursor:
+            cursor.execute(sql, params)
+            scores = cursor.fetchall()
+        posts = self.object_list.in_bulk([post_id for post_id, _ in scores])
+        rows = []
+        for post_id, score in scores:
+            post = posts.get(post_id)
+            if post is not None:
+                post.score = score
+                rows.append(post)
+        return rows
+
+
+def search_page(request, text):
+    """Страница результатов поиска по тексту постов."""
+    match = match_expression(text)
+    if not match:
+        return paginate_page(request, Post.objects.none())
+    if not is_available():
+        words = re.findall(r'\w+', text)
+        posts = Post.objects.filter(
+            *[Q(text__icontains=word) for word in words]
+        ).select_related('author', 'group')
+        return paginate_page(request, posts)
+    paginator = SearchPaginator(match, settings.POSTS_PER_PAGE)
+    return paginator.get_page(request.GET.get('cursor'))
@@ -0,0 +1,208 @@
+from django.db.models.signals import (
+    post_delete, post_save, pre_delete, pre_save
+)
+from django.dispatch import receiver
+from django.utils import timezone
+
+from . import cache, counters, feed, thumbnails, timeline
+from .models import AuthorStats, Comment, Follow, Group, Post, User
+
+
+# Поля, которые видны на карточках, в шапках и лентах RSS.
+USER_SHOWN_FIELDS = ('username', 'first_name', 'last_name')
+GROUP_SHOWN_FIELDS = ('title', 'slug', 'description')
+
+
+def shown_before(instance, fields, update_fields):
+    """Видимые поля до сохранения; None - если они не меняются.
+
+    Вход пользователя сохраняет только last_login: тогда сравнивать
+    нечего и лишнего запроса нет.
+    """
+    if not instance.pk or (
+        update_fields is not None and not set(fields) & set(update_fields)
+    ):
+        return None
+    previous = type(instance).objects.filter(pk=instance.pk).values(
+        *fields
+    ).first()
+    if previous is None or all(
+        previous[name] == getattr(instance, name) for name in fields
+    ):
+        return None
+    return previous
+
+
+def refresh_posts(posts):
+    """Новая версия постов: меняются ключи карточек и ETag страниц."""
+    posts.update(updated_at=timezone.now())
+
+
+@receiver(pre_save, sender=User)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    instance._previous_shown = shown_before(
+        instance, USER_SHOWN_FIELDS, update_fields
+    )
+
+
+@receiver(post_save, sender=User)
+def user_saved(sender, instance, created, **kwargs):
+    if created:
+        AuthorStats.objects.get_or_create(user=instance)
+    previous = getattr(instance, '_previous_shown', None)
+    if previous is None:
+        return
+    # Имя автора - на карточках его постов во всех списках и в его
+    # комментариях на страницах чужих постов.
+    posts = Post.objects.filter(author=instance)
+    refresh_posts(posts)
+    scopes = {('index',)}
+    for username in (previous['username'], instance.username):
+        scopes.update({('author', username), ('profile', username)})
+    scopes.update(
+        ('group', slug) for slug in posts.filter(
+            group__isnull=False
+        ).order_by().values_list('group__slug', flat=True).distinct()
+    )
+    scopes.update(
+        ('post', post_id) for post_id in Comment.objects.filter(
+            author=instance
+        ).order_by().values_list('post_id', flat=True).distinct()
+    )
+    for scope in scopes:
+        cache.bump(*scope)
+
+
+def bump_post_scopes(post):
+    scopes = set(cache.post_scopes(post))
+    scopes.update(getattr(post, '_previous_scopes', ()))
+    for scope in scopes:
+        cache.bump(*scope)
+
+
+@receiver(pre_save, sender=Post)
+def post_saving(sender, instance, **kwargs):
+    # При смене группы пост уходит из старого списка - его тоже сбросим,
+    # как и карточку прежней версии поста.
+    if instance.pk:
+        previous = Post.objects.filter(pk=instance.pk).select_related(
+            'author', 'group'
+        ).first()
+        if previous is not None:
+            instance._previous_scopes = cache.post_scopes(previous)
+            instance._previous_version = previous
+
+
+@receiver(post_save, sender=Post)
+def post_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(instance.author_id, posts_count=1)
+        feed.fan_out(instance)
+        timeline.add(instance)
+    bump_post_scopes(instance)
+    previous = getattr(instance, '_previous_version', None)
+    previous_image = previous.image.name if previous is not None else ''
+    if (instance.image.name or '') != (previous_image or ''):
+        thumbnails.schedule(instance)
+    if previous is not None:
+        cache.forget_card(previous)
+        if previous.author_id != instance.author_id:
+            # Пост передан другому автору (например, в админке).
+            counters.bump(previous.author_id, posts_count=-1)
+            counters.bump(instance.author_id, posts_count=1)
+            timeline.forget(previous.author_id)
+            timeline.forget(instance.author_id)
+
+
+@receiver(post_delete, sender=Post)
+def post_deleted(sender, instance, **kwargs):
+    counters.bump(instance.author_id, posts_count=-1)
+    bump_post_scopes(instance)
+    cache.forget_card(instance)
+    timeline.remove(instance)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump_comments(instance.post_id, 1)
+    cache.bump('post', instance.post_id)
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    counters.bump_comments(instance.post_id, -1)
+    cache.bump('post', instance.post_id)
+
+
+@receiver(pre_save, sender=Group)
+def group_saving(sender, instance, update_fields=None, **kwargs):
+    instance._previous_shown = shown_before(
+        instance, GROUP_SHOWN_FIELDS, update_fields
+    )
+
+
+@receiver(post_save, sender=Group)
+def group_saved(sender, instance, **kwargs):
+    cache.bump('group', instance.slug)
+    previous = getattr(instance, '_previous_shown', None)
+    if previous is None:
+        return
+    # Группа видна на карточках своих постов на главной и в профилях.
+    posts = Post.objects.filter(group=instance)
+    refresh_posts(posts)
+    scopes = {('index',), ('group', previous['slug'])}
+    scopes.update(
+        ('author', username) for username in posts.order_by().values_list(
+            'author__username', flat=True
+        ).distinct()
+    )
+    for scope in scopes:
+        cache.bump(*scope)
+
+
+@receiver(pre_delete, sender=Group)
+def group_deleting(sender, instance, **kwargs):
+    # SET_NULL обнуляет группу постов одним UPDATE без сигналов:
+    # версии постов меняем, пока посты ещё можно найти по группе.
+    posts = Post.objects.filter(group=instance)
+    instance._authors = set(posts.order_by().values_list(
+        'author__username', flat=True
+    ).distinct())
+    refresh_posts(posts)
+
+
+@receiver(post_delete, sender=Group)
+def group_deleted(sender, instance, **kwargs):
+    scopes = {('index',), ('group', instance.slug)}
+    scopes.update(
+        ('author', username)
+        for username in getattr(instance, '_authors', ())
+    )
+    for scope in scopes:
+        cache.bump(*scope)
+
+
+def bump_profiles(follow):
+    """Счётчики подписок видны в шапке профилей обоих участников."""
+    cache.bump('profile', follow.author.username)
+    cache.bump('profile', follow.user.username)
+
+
+@receiver(post_save, sender=Follow)
+def follow_saved(sender, instance, created, **kwargs):
+    if created:
+        counters.bump(instance.author_id, followers_count=1)
+        counters.bump(instance.user_id, following_count=1)
+        feed.update_mode(instance.author_id)
+        feed.backfill(instance)
+    bump_profiles(instance)
+
+
+@receiver(post_delete, sender=Follow)
+def follow_deleted(sender, instance, **kwargs):
+    counters.bump(instance.author_id, followers_count=-1)
+    counters.bump(instance.user_id, following_count=-1)
+    feed.prune(instance)
+    feed.update_mode(instance.author_id)
+    bump_profiles(instance)
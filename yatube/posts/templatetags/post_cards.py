@@ -0,0 +1,16 @@
+from django import template
+from django.utils.safestring import mark_safe
+
+from posts.cache import render_cards
+
+register = template.Library()
+
+
+@register.simple_tag
+def post_cards(posts):
+    """Карточки постов страницы из кеша (см. posts.cache.render_cards).
+
+    {% post_cards page_obj as cards %}
+    {% for card in cards %}{{ card }}{% endfor %}
+    """
+    return [mark_safe(card) for card in render_cards(posts)]
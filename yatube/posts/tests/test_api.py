@@ -0,0 +1,158 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase
+from django.urls import reverse
+
+from posts.models import AuthorStats, Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ApiTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='api_author')
+        cls.reader = User.objects.create_user(username='api_reader')
+        cls.group = Group.objects.create(
+            title='API', slug='api', description='Описание'
+        )
+        for num in range(12):
+            Post.objects.create(
+                author=cls.author, group=cls.group, text=f'Пост {num}'
+            )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Последний пост'
+        )
+        Comment.objects.create(
+            author=cls.reader, post=cls.post, text='Комментарий'
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_lists_walk_with_cursor(self):
+        """Списки отдаются курсорными страницами без пропусков."""
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=['api']),
+            reverse('posts:api_profile', args=['api_author']),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                data = self.client.get(url).json()
+                self.assertEqual(data['results'][0]['text'], 'Последний пост')
+                self.assertEqual(data['results'][0]['author'], 'api_author')
+                rest = self.client.get(url, {'cursor': data['next']}).json()
+                self.assertEqual(len(data['results'] + rest['results']), 13)
+                self.assertIsNone(rest['next'])
+        data = self.client.get(reverse(
+            'posts:api_profile', args=['api_author']
+        )).json()
+        self.assertEqual(data['author']['posts_count'], 13)
+
+    def test_fields_narrow_select(self):
+        """fields= сужает ответ и SELECT, лишние JOIN не делаются."""
+        with self.assertNumQueries(1) as queries:
+            response = self.client.get(
+                reverse('posts:api_index'), {'fields': 'id,text'}
+            )
+        self.assertEqual(set(response.json()['results'][0]), {'id', 'text'})
+        sql = queries.captured_queries[0]['sql']
+        self.assertNotIn('JOIN', sql)
+        self.assertNotIn('"image"', sql)
+        response = self.client.get(
+            reverse('posts:api_index'), {'fields': 'id,password'}
+        )
+        self.assertEqual(response.status_code, 400)
+
+    def test_detail_and_comments(self):
+        """Пост и его комментарии доступны отдельно."""
+        data = self.client.get(
+            reverse('posts:api_post_detail', args=[self.post.pk])
+        ).json()
+        self.assertEqual(data['group'], 'api')
+        self.assertEqual(data['comments_count'], 1)
+        data = self.client.get(
+            reverse('posts:api_post_comments', args=[self.post.pk])
+        ).json()
+        self.assertEqual(
+            [comment['text'] for comment in data['results']], ['Комментарий']
+        )
+        response = self.client.get(
+            reverse('posts:api_post_detail', args=[0])
+        )
+        self.assertEqual(response.status_code, 404)
+
+    def test_etag_follows_generation(self):
+        """Актуальный ETag даёт 304, новый комментарий его меняет."""
+        url = reverse('posts:api_post_comments', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        with self.assertNumQueries(0):
+            response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(author=self.reader, post=self.post, text='Ещё')
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_list_etags_follow_payload(self):
+        """Комментарий и подписка меняют ETag списков, где они видны."""
+        urls = [
+            reverse('posts:api_index'),
+            reverse('posts:api_group_list', args=['api']),
+            reverse('posts:api_profile', args=['api_author']),
+        ]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        with self.assertNumQueries(1):
+            response = self.client.get(
+                urls[0], HTTP_IF_NONE_MATCH=etags[urls[0]]
+            )
+        self.assertEqual(response.status_code, 304)
+        Comment.objects.create(author=self.reader, post=self.post, text='Ещё')
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etags[url])
+                self.assertEqual(response.status_code, 200)
+                etags[url] = response['ETag']
+        Follow.objects.create(user=self.reader, author=self.author)
+        response = self.client.get(urls[2], HTTP_IF_NONE_MATCH=etags[urls[2]])
+        self.assertEqual(response.json()['author']['followers_count'], 1)
+
+    def test_detail_etag_follows_author_and_group(self):
+        """Новое имя автора или группы меняет ETag поста."""
+        url = reverse('posts:api_post_detail', args=[self.post.pk])
+        etag = self.client.get(url)['ETag']
+        author = User.objects.get(pk=self.author.pk)
+        author.username = 'api_renamed'
+        author.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.json()['author'], 'api_renamed')
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'api-renamed'
+        group.save()
+        response = self.client.get(
+            url, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.json()['group'], 'api-renamed')
+
+    def test_profile_without_stats(self):
+        """Нет строки счётчиков - она пересчитывается, а не падает 500."""
+        AuthorStats.objects.filter(user=self.author).delete()
+        response = self.client.get(
+            reverse('posts:api_profile', args=['api_author'])
+        )
+        self.assertEqual(response.json()['author']['posts_count'], 13)
+
+    def test_follow_feed(self):
+        """Лента подписок требует входа и отдаёт посты авторов."""
+        url = reverse('posts:api_follow_index')
+        self.assertEqual(self.client.get(url).status_code, 401)
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.client.force_login(self.reader)
+        response = self.client.get(url, {'fields': 'text'})
+        self.assertEqual(
+            response.json()['results'][0], {'text': 'Последний пост'}
+        )
+        response = self.client.get(
+            url, {'fields': 'text'}, HTTP_IF_NONE_MATCH=response['ETag']
+        )
+        self.assertEqual(response.status_code, 304)
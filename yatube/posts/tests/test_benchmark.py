@@ -0,0 +1,83 @@
+import json
+import os
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import CommandError, call_command
+from django.test import TestCase
+
+from posts.benchmark import compare, percentile
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+
+class BenchmarkTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        author = User.objects.create_user(username='bench_author')
+        reader = User.objects.create_user(username='bench_reader')
+        group = Group.objects.create(
+            title='Замеры', slug='bench', description='Описание'
+        )
+        for num in range(15):
+            post = Post.objects.create(
+                author=author, group=group, text=f'Пост {num}'
+            )
+        Comment.objects.create(author=reader, post=post, text='Комментарий')
+        Follow.objects.create(user=reader, author=author)
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.baseline = os.path.join(self.directory.name, 'baseline.json')
+
+    def tearDown(self):
+        self.directory.cleanup()
+
+    def benchmark(self, *args):
+        out = StringIO()
+        call_command(
+            'benchmark', '--requests', '3', '--warmup', '0',
+            '--depths', '1,2', '--baseline', self.baseline, *args, stdout=out
+        )
+        return out.getvalue()
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(percentile(values, 0.5), 50)
+        self.assertEqual(percentile(values, 0.99), 99)
+        self.assertEqual(percentile([7], 0.95), 7)
+
+    def test_compare_thresholds(self):
+        """Время сравнивается с порогом и поправкой, запросы - строго."""
+        base = {'index@1': {'p50_ms': 10, 'p95_ms': 20, 'queries': 2}}
+        same = {'index@1': {'p50_ms': 12, 'p95_ms': 24, 'queries': 2}}
+        self.assertEqual(compare(same, base, 0.25), [])
+        slower = {'index@1': {'p50_ms': 13, 'p95_ms': 20, 'queries': 3}}
+        self.assertEqual(len(compare(slower, base, 0.25)), 2)
+        self.assertEqual(len(compare(slower, base, 0.25, speed=2)), 1)
+
+    def test_command_writes_and_checks_baseline(self):
+        """Замер пишется в JSON и сверяется с базовым."""
+        self.benchmark('--save-baseline')
+        with open(self.baseline, encoding='utf-8') as file:
+            report = json.load(file)
+        self.assertEqual(
+            {key.split('@')[0] for key in report['results']},
+            {'index', 'group_posts', 'profile', 'post_detail',
+             'follow_index'}
+        )
+        self.assertIn('index@2', report['results'])
+        self.assertIn('p99_ms', report['results']['index@1'])
+        # Страницы строит view, а не копия для гостей из кеша.
+        for key, metrics in report['results'].items():
+            with self.subTest(key=key):
+                self.assertGreater(metrics['queries'], 0)
+        for metrics in report['results'].values():
+            metrics['queries'] -= 1
+        with open(self.baseline, 'w', encoding='utf-8') as file:
+            json.dump(report, file)
+        with self.assertRaisesMessage(CommandError, 'queries'):
+            self.benchmark('--threshold', '100')
@@ -0,0 +1,134 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.middleware import QueryBudgetExceeded
+from posts.models import Comment, Follow, Group, Post
+
+User = get_user_model()
+
+# Имя URL -> аргументы; 'post' заменяется на id поста из данных.
+PAGES = {
+    'index': [],
+    'group_list': ['budget'],
+    'profile': ['budget_0'],
+    'post_detail': ['post'],
+    'post_comments': ['post'],
+    'post_create': [],
+    'post_edit': ['post'],
+    'follow_index': [],
+    'search': [],
+    'search_api': [],
+    'index_rss': [],
+    'index_atom': [],
+    'group_rss': ['budget'],
+    'group_atom': ['budget'],
+    'profile_rss': ['budget_0'],
+    'profile_atom': ['budget_0'],
+    'api_index': [],
+    'api_group_list': ['budget'],
+    'api_profile': ['budget_0'],
+    'api_post_detail': ['post'],
+    'api_post_comments': ['post'],
+    'api_follow_index': [],
+}
+# Формы: имя URL -> (аргументы, данные POST).
+WRITES = {
+    'post_create': ([], {'text': 'Новый пост', 'group': 'group'}),
+    'post_edit': (['post'], {'text': 'Правка', 'group': 'group'}),
+}
+
+
+@override_settings(QUERY_BUDGET_STRICT=True, THUMBNAIL_WORKERS=0)
+class QueryBudgetTests(TestCase):
+    """Страницы не выходят за бюджет запросов при любом объёме данных.
+
+    Данных заведомо больше одной страницы: на каждый пост несколько
+    комментариев от разных авторов, читатель подписан на всех, так
+    что запрос на строку списка сразу превысит бюджет.
+    """
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Бюджет', slug='budget', description='Описание'
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'budget_{num}')
+            for num in range(4)
+        ]
+        cls.reader = User.objects.create_user(username='budget_reader')
+        for author in cls.authors:
+            Follow.objects.create(user=cls.reader, author=author)
+            for num in range(6):
+                cls.post = Post.objects.create(
+                    author=author, group=cls.group,
+                    text=f'Текст {num}'
+                )
+                for commenter in cls.authors:
+                    Comment.objects.create(
+                        post=cls.post, author=commenter, text='Комментарий'
+                    )
+
+    def setUp(self):
+        cache.clear()
+        self.client = Client()
+        self.client.force_login(self.authors[0])
+
+    def test_registry_covers_pages(self):
+        """Каждая страница теста имеет бюджет и наоборот."""
+        self.assertEqual(
+            {f'posts:{name}' for name in PAGES},
+            {name for name in settings.QUERY_BUDGETS
+             if name.startswith('posts:')}
+        )
+        self.assertEqual(
+            {f'POST posts:{name}' for name in WRITES},
+            {name for name in settings.QUERY_BUDGETS
+             if name.startswith('POST posts:')}
+        )
+
+    def test_pages_within_budget(self):
+        """Страницы укладываются в бюджет (иначе - QueryBudgetExceeded)."""
+        Follow.objects.create(user=self.authors[0], author=self.authors[1])
+        for name, args in PAGES.items():
+            args = [self.post.pk if arg == 'post' else arg for arg in args]
+            with self.subTest(name=name):
+                response = self.client.get(
+                    reverse(f'posts:{name}', args=args), {'q': 'Текст'}
+                )
+                self.assertEqual(response.status_code, 200)
+
+    def test_writes_within_budget(self):
+        """Отправка форм сверяется со своим бюджетом, а не с бюджетом
+        страницы формы."""
+        own_post = Post.objects.filter(author=self.authors[0]).first()
+        values = {'post': own_post.pk, 'group': self.group.pk}
+        for name, (args, data) in WRITES.items():
+            args = [values.get(arg, arg) for arg in args]
+            data = {key: values.get(value, value)
+                    for key, value in data.items()}
+            with self.subTest(name=name):
+                response = self.client.post(
+                    reverse(f'posts:{name}', args=args), data
+                )
+                self.assertEqual(response.status_code, 302)
+                self.assertTrue(Post.objects.filter(text=data['text']))
+
+    @override_settings(QUERY_BUDGETS={'posts:index': 1})
+    def test_over_budget_fails(self):
+        """Превышение бюджета роняет запрос в строгом режиме."""
+        with self.assertRaises(QueryBudgetExceeded):
+            self.client.get(reverse('posts:index'))
+
+    @override_settings(QUERY_TIMING_HEADER=True)
+    def test_server_timing_header(self):
+        """Server-Timing сообщает число запросов и повторы."""
+        response = Client().get(reverse('posts:index'))
+        self.assertRegex(
+            response['Server-Timing'],
+            r'^db;dur=[\d.]+;desc="1 queries, 0 duplicates"$'
+        )
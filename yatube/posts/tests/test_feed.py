@@ -0,0 +1,82 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import AuthorStats, FeedEntry, Follow, Post
+
+User = get_user_model()
+
+
+class FollowFeedTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feed_author')
+        cls.reader = User.objects.create_user(username='feed_reader')
+        cls.old_post = Post.objects.create(
+            author=cls.author, text='Пост до подписки'
+        )
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(FollowFeedTests.reader)
+
+    def follow(self):
+        self.client.get(reverse(
+            'posts:profile_follow', args=[self.author.username]
+        ))
+
+    def feed_posts(self):
+        response = self.client.get(reverse('posts:follow_index'))
+        return list(response.context['page_obj'].object_list)
+
+    def test_follow_backfills_and_unfollow_prunes(self):
+        """Подписка заполняет ленту, отписка её очищает."""
+        self.follow()
+        self.assertEqual(self.feed_posts(), [self.old_post])
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertEqual(self.feed_posts(), [new_post, self.old_post])
+        self.client.get(reverse(
+            'posts:profile_unfollow', args=[self.author.username]
+        ))
+        self.assertFalse(FeedEntry.objects.filter(user=self.reader).exists())
+        self.assertEqual(self.feed_posts(), [])
+
+    def test_deleted_post_leaves_feed(self):
+        """Удалённый пост пропадает из ленты."""
+        self.follow()
+        Post.objects.filter(pk=self.old_post.pk).delete()
+        self.assertEqual(self.feed_posts(), [])
+
+    @override_settings(FEED_FANOUT_LIMIT=1)
+    def test_large_author_is_read_on_demand(self):
+        """Посты крупного автора не копируются, но видны в ленте."""
+        self.follow()
+        new_post = Post.objects.create(author=self.author, text='Новый')
+        self.assertFalse(FeedEntry.objects.filter(post=new_post).exists())
+        self.assertEqual(self.feed_posts(), [new_post, self.old_post])
+
+    @override_settings(FEED_FANOUT_LIMIT=3, FEED_FANOUT_RESUME=2)
+    def test_mode_switches_with_hysteresis(self):
+        """Режим автора хранится и меняется только за порогами,
+        посты не пропадают из ленты ни в каком режиме."""
+        self.follow()
+        others = [
+            User.objects.create_user(username=f'feed_other_{num}')
+            for num in range(2)
+        ]
+        for other in others:
+            Follow.objects.create(user=other, author=self.author)
+        self.assertFalse(AuthorStats.objects.get(user=self.author).fanout)
+        self.assertFalse(FeedEntry.objects.filter(author=self.author).exists())
+        self.assertEqual(self.feed_posts(), [self.old_post])
+        Follow.objects.filter(user=others[0]).delete()
+        self.assertFalse(AuthorStats.objects.get(user=self.author).fanout)
+        self.assertEqual(self.feed_posts(), [self.old_post])
+        Follow.objects.filter(user=others[1]).delete()
+        self.assertTrue(AuthorStats.objects.get(user=self.author).fanout)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=self.old_post)
+            .exists()
+        )
+        self.assertEqual(self.feed_posts(), [self.old_post])
@@ -0,0 +1,86 @@
+from datetime import timedelta
+
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+from django.utils.http import http_date
+
+from posts.models import Group, Post
+
+User = get_user_model()
+
+
+class FeedsTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='feeds_author')
+        cls.group = Group.objects.create(
+            title='Ленты', slug='feeds', description='Описание'
+        )
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Пост для ленты'
+        )
+
+    def setUp(self):
+        self.client = Client()
+
+    def test_feeds_list_posts(self):
+        """RSS и Atom отдаются для всех трёх лент."""
+        urls = {
+            reverse('posts:index_rss'): 'application/rss+xml',
+            reverse('posts:index_atom'): 'application/atom+xml',
+            reverse('posts:group_rss', args=['feeds']): 'application/rss+xml',
+            reverse('posts:group_atom', args=['feeds']):
+                'application/atom+xml',
+            reverse('posts:profile_rss', args=['feeds_author']):
+                'application/rss+xml',
+            reverse('posts:profile_atom', args=['feeds_author']):
+                'application/atom+xml',
+        }
+        for url, content_type in urls.items():
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                self.assertTrue(response['Content-Type'].startswith(
+                    content_type
+                ))
+                self.assertContains(response, 'Пост для ленты')
+        response = self.client.get(reverse('posts:group_rss', args=['none']))
+        self.assertEqual(response.status_code, 404)
+
+    def test_conditional_get_and_invalidation(self):
+        """Актуальная копия даёт 304, новый пост меняет ETag и тело."""
+        url = reverse('posts:group_rss', args=['feeds'])
+        response = self.client.get(url)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        with self.assertNumQueries(1):
+            cached = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(cached.status_code, 304)
+        Post.objects.create(
+            author=self.author, group=self.group, text='Свежий пост'
+        )
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+        self.assertContains(response, 'Свежий пост')
+
+    @override_settings(ALLOWED_HOSTS=['testserver', 'mirror.testserver'])
+    def test_last_modified_and_host(self):
+        """Last-Modified - правка свежего поста, копии хостов раздельны."""
+        url = reverse('posts:index_rss')
+        post = Post.objects.create(author=self.author, text='Правленый')
+        Post.objects.filter(pk=post.pk).update(
+            updated_at=post.pub_date + timedelta(days=1)
+        )
+        cache.clear()
+        response = self.client.get(url)
+        self.assertEqual(
+            response['Last-Modified'],
+            http_date((post.pub_date + timedelta(days=1)).timestamp())
+        )
+        other = self.client.get(url, HTTP_HOST='mirror.testserver')
+        self.assertContains(other, 'http://mirror.testserver/')
+        self.assertNotEqual(other['ETag'], response['ETag'])
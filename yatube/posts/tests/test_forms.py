@@ -1,14 +1,20 @@
+import hashlib
 from http import HTTPStatus
+from io import StringIO
 import shutil
 import tempfile
+from unittest import mock
 
+from django.core.files.storage import default_storage
 from django.core.files.uploadedfile import SimpleUploadedFile
 from django.conf import settings
 from django.contrib.auth import get_user_model
+from django.core.management import call_command
 from django.test import Client, TestCase, override_settings
 from django.urls import reverse
 
-from posts.models import Group, Post
+from posts import renditions, thumbnails
+from posts.models import Group, Post, Rendition
 
 User = get_user_model()
 TEMP_MEDIA_ROOT = tempfile.mkdtemp(dir=settings.BASE_DIR)
@@ -33,6 +39,7 @@ class PostFormTests(TestCase):
             b'\x02\x00\x01\x00\x00\x02\x02\x0C'
             b'\x0A\x00\x3B'
         )
+        cls.small_gif = small_gif
         cls.uploaded = SimpleUploadedFile(
             name='small.gif',
             content=small_gif,
@@ -110,3 +117,153 @@ class PostFormTests(TestCase):
             follow=True)
         self.assertRedirects(response, '/auth/login/?next=/create/')
         self.assertEqual(posts_count, Post.objects.count())
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_create_post_prepares_thumbnail(self):
+        """Миниатюра готовится при сохранении формы, а не в шаблоне."""
+        self.authorized_client.post(
+            reverse('posts:post_create'),
+            data={
+                'text': 'Пост с картинкой',
+                'image': SimpleUploadedFile(
+                    'thumb.gif', self.small_gif, content_type='image/gif'
+                ),
+            },
+        )
+        post = Post.objects.get(text='Пост с картинкой')
+        self.assertEqual(
+            (post.image_width, post.image_height, post.image_size,
+             post.image_format, post.image_hash),
+            (2, 1, len(self.small_gif), 'gif',
+             hashlib.sha256(self.small_gif).hexdigest())
+        )
+        renditions = Rendition.objects.filter(post=post)
+        self.assertEqual(
+            sorted(renditions.values_list('format', 'width', 'height')),
+            [('png', 320, 113), ('webp', 320, 113)]
+        )
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'type="image/webp"')
+        self.assertContains(response, 'loading="lazy"')
+        for rendition in renditions:
+            self.assertContains(response, f'{rendition.url} 320w')
+
+    def test_build_renditions_command(self):
+        """Команда строит варианты для уже загруженных картинок."""
+        post = Post.objects.create(
+            text='Старый пост',
+            author=self.user,
+            image=SimpleUploadedFile(
+                'old.gif', self.small_gif, content_type='image/gif'
+            )
+        )
+        call_command('build_renditions', stdout=StringIO())
+        self.assertEqual(post.renditions.count(), 2)
+        self.assertIsNotNone(
+            Post.objects.prefetch_related('renditions').get(pk=post.pk)
+            .picture
+        )
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_thumbnail_built_without_form(self):
+        """Миниатюры получают и посты, созданные мимо формы."""
+        post = Post.objects.create(
+            text='Пост из админки',
+            author=self.user,
+            image=SimpleUploadedFile(
+                'admin.gif', self.small_gif, content_type='image/gif'
+            )
+        )
+        self.assertEqual(post.renditions.count(), 2)
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertNotContains(response, 'Изображение обрабатывается')
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_rebuild_swaps_renditions(self):
+        """Пересборка подменяет варианты, старые файлы удаляются."""
+        post = Post.objects.create(
+            text='Пересборка',
+            author=self.user,
+            image=SimpleUploadedFile(
+                'swap.gif', self.small_gif, content_type='image/gif'
+            )
+        )
+        old_paths = set(post.renditions.values_list('path', flat=True))
+        call_command('build_renditions', '--force', stdout=StringIO())
+        new_paths = set(post.renditions.values_list('path', flat=True))
+        self.assertEqual(len(new_paths), 2)
+        self.assertFalse(old_paths & new_paths)
+        for path in old_paths:
+            self.assertFalse(default_storage.exists(path))
+        for path in new_paths:
+            self.assertTrue(default_storage.exists(path))
+
+    @override_settings(THUMBNAIL_WORKERS=0)
+    def test_outdated_job_is_discarded(self):
+        """Задача, чью картинку заменили во время сборки, не трогает
+        варианты новой картинки и убирает свои файлы."""
+        post = Post.objects.create(
+            text='Две загрузки',
+            author=self.user,
+            image=SimpleUploadedFile(
+                'first.gif', self.small_gif, content_type='image/gif'
+            )
+        )
+        current = set(post.renditions.values_list('path', flat=True))
+        saved = []
+        build = renditions.build
+
+        def replaced_while_building(*args):
+            # Пока задача собирает варианты, пост получает новую картинку.
+            Post.objects.filter(pk=post.pk).update(image='posts/second.gif')
+            for variant in build(*args):
+                saved.append(variant)
+                yield variant
+
+        paths = []
+        save = default_storage.save
+
+        def remember(*args, **kwargs):
+            paths.append(save(*args, **kwargs))
+            return paths[-1]
+
+        with mock.patch.object(
+            renditions, 'build', replaced_while_building
+        ), mock.patch.object(default_storage, 'save', remember):
+            thumbnails.generate(post.pk)
+        self.assertEqual(len(saved), 2)
+        self.assertEqual(
+            set(post.renditions.values_list('path', flat=True)), current
+        )
+        self.assertEqual(len(paths), 2)
+        for path in paths:
+            self.assertFalse(default_storage.exists(path))
+        for path in current:
+            self.assertTrue(default_storage.exists(path))
+
+    def test_thumbnail_placeholder_while_pending(self):
+        """Пока миниатюра не готова (задача ждёт фиксации транзакции
+        или свободного потока), показывается заглушка."""
+        Post.objects.create(
+            text='Ждёт миниатюру',
+            author=self.user,
+            image=SimpleUploadedFile(
+                'pending.gif', self.small_gif, content_type='image/gif'
+            )
+        )
+        response = self.guest_client.get(reverse('posts:index'))
+        self.assertContains(response, 'Изображение обрабатывается')
+
+    def test_backfill_image_meta_command(self):
+        """Команда заполняет сведения о картинках старых постов."""
+        post = Post.objects.create(
+            text='Пост без сведений',
+            author=self.user,
+            image=SimpleUploadedFile(
+                'meta.gif', self.small_gif, content_type='image/gif'
+            )
+        )
+        call_command('backfill_image_meta', stdout=StringIO())
+        post.refresh_from_db()
+        self.assertEqual((post.image_width, post.image_height), (2, 1))
+        self.assertEqual(post.image_size, len(self.small_gif))
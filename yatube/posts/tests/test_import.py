@@ -0,0 +1,106 @@
+import json
+import os
+import shutil
+import tempfile
+from io import StringIO
+
+from django.contrib.auth import get_user_model
+from django.core.management import call_command
+from django.test import TestCase
+
+from posts.models import AuthorStats, Comment, FeedEntry, Follow, Group, Post
+
+User = get_user_model()
+
+
+class ImportContentTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.reader = User.objects.create_user(username='import_reader')
+        cls.author = User.objects.create_user(username='import_author')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.directory = tempfile.mkdtemp()
+
+    def tearDown(self):
+        shutil.rmtree(self.directory, ignore_errors=True)
+
+    def write(self, name, content):
+        path = os.path.join(self.directory, name)
+        with open(path, 'w', encoding='utf-8') as file:
+            file.write(content)
+        return path
+
+    def run_import(self, path, *args):
+        call_command('import_content', path, *args, stdout=StringIO())
+
+    def test_import_posts_and_comments(self):
+        """Импорт создаёт записи пачками и обновляет счётчики и ленты."""
+        groups = self.write(
+            'groups.csv', 'slug,title,description\nimported,Группа,Описание\n'
+        )
+        self.run_import(groups, '--kind', 'group')
+        posts = self.write('posts.jsonl', '\n'.join(json.dumps(record) for
+                           record in [
+            {'text': 'Старый пост', 'author': 'import_author',
+             'group': 'imported', 'pub_date': '2020-01-02T03:04:05+00:00'},
+            {'text': 'Пост нового автора', 'author': 'newcomer'},
+            {'text': 'Без автора', 'author': 'nobody'},
+        ]))
+        self.run_import(posts, '--kind', 'post', '--batch-size', '2',
+                        '--create-authors')
+        self.assertEqual(Post.objects.count(), 3)
+        post = Post.objects.get(text='Старый пост')
+        self.assertEqual(post.group, Group.objects.get(slug='imported'))
+        self.assertEqual(post.pub_date.year, 2020)
+        self.assertTrue(
+            FeedEntry.objects.filter(user=self.reader, post=post).exists()
+        )
+        self.assertEqual(
+            AuthorStats.objects.get(user=self.author).posts_count, 1
+        )
+        comments = self.write(
+            'comments.csv',
+            f'post,author,text\n{post.pk},import_reader,Комментарий\n'
+        )
+        self.run_import(comments, '--kind', 'comment')
+        post.refresh_from_db()
+        self.assertEqual(post.comments_count, 1)
+        self.assertEqual(Comment.objects.get().author, self.reader)
+
+    def test_resume_from_checkpoint(self):
+        """Повторный запуск продолжает с контрольной точки."""
+        path = self.write('posts.jsonl', '\n'.join(
+            json.dumps({'text': f'Пост {num}', 'author': 'import_author'})
+            for num in range(3)
+        ))
+        with open(path + '.checkpoint', 'w') as file:
+            file.write('2')
+        self.run_import(path, '--kind', 'post')
+        self.assertEqual(
+            list(Post.objects.values_list('text', flat=True)), ['Пост 2']
+        )
+        with open(path + '.checkpoint') as file:
+            self.assertEqual(file.read(), '3')
+
+    def test_resume_after_crash_inside_batch(self):
+        """Незавершённая отметка решается по тому, дошла ли пачка до базы."""
+        path = self.write('posts.jsonl', '\n'.join(
+            json.dumps({'text': f'Пост {num}', 'author': 'import_author'})
+            for num in range(3)
+        ))
+        Post.objects.create(text='Пост 0', author=self.author)
+        mark = Post.objects.get().pk
+        with open(path + '.checkpoint', 'w') as file:
+            file.write(f'0 1 {mark - 1}')
+        self.run_import(path, '--kind', 'post')
+        self.assertEqual(
+            sorted(Post.objects.values_list('text', flat=True)),
+            ['Пост 0', 'Пост 1', 'Пост 2']
+        )
+        with open(path + '.checkpoint', 'w') as file:
+            file.write(f'0 3 {Post.objects.latest("pk").pk}')
+        self.run_import(path, '--kind', 'post')
+        self.assertEqual(Post.objects.count(), 6)
@@ -0,0 +1,55 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from core.query_plans import CapturePlans
+from posts.models import Comment, Follow, Group, Post
+from posts.tests.test_budgets import PAGES
+
+User = get_user_model()
+
+ALLOW = (
+    # Список групп в форме поста - небольшой справочник целиком.
+    'SCAN posts_group',
+    # Ранжирование поиска сортирует найденное по bm25.
+    'FROM posts_post_fts',
+)
+
+
+@override_settings(THUMBNAIL_WORKERS=0)
+class QueryPlanTests(TestCase):
+    """Запросы страниц идут по индексам, без полных просмотров таблиц
+    и сортировок во временных B-деревьях."""
+
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.group = Group.objects.create(
+            title='Бюджет', slug='budget', description='Описание'
+        )
+        cls.authors = [
+            User.objects.create_user(username=f'budget_{num}')
+            for num in range(2)
+        ]
+        for author in cls.authors:
+            Follow.objects.create(user=cls.authors[0], author=author)
+            for num in range(3):
+                cls.post = Post.objects.create(
+                    author=author, group=cls.group, text=f'Текст {num}'
+                )
+                Comment.objects.create(
+                    post=cls.post, author=author, text='Комментарий'
+                )
+
+    def test_pages_use_indexes(self):
+        client = Client()
+        client.force_login(self.authors[0])
+        for name, args in PAGES.items():
+            args = [self.post.pk if arg == 'post' else arg for arg in args]
+            cache.clear()
+            with self.subTest(name=name), CapturePlans(allow=ALLOW) as plans:
+                client.get(
+                    reverse(f'posts:{name}', args=args), {'q': 'Текст'}
+                )
+                self.assertEqual(plans.problems(), [])
@@ -0,0 +1,69 @@
+from django.contrib.auth import get_user_model
+from django.test import Client, TestCase, override_settings
+from django.urls import reverse
+
+from posts.models import Post
+
+User = get_user_model()
+
+
+class SearchTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='search_user')
+        cls.cat = Post.objects.create(author=cls.user, text='Кошка на крыше')
+        cls.cats = Post.objects.create(
+            author=cls.user, text='Кошка и ещё раз кошка, кошка'
+        )
+        Post.objects.create(author=cls.user, text='Собака во дворе')
+
+    def setUp(self):
+        self.client = Client()
+
+    def found(self, query, **params):
+        response = self.client.get(
+            reverse('posts:search'), {'q': query, **params}
+        )
+        return list(response.context['page_obj'].object_list)
+
+    def test_ranked_results(self):
+        """Поиск находит посты и ставит более релевантные выше."""
+        self.assertEqual(self.found('кошка'), [self.cats, self.cat])
+        self.assertEqual(self.found('кош'), [self.cats, self.cat])
+        self.assertEqual(self.found('"NEAR(  '), [])
+
+    def test_index_follows_changes(self):
+        """Индекс обновляется при изменении и удалении поста."""
+        cat = Post.objects.get(pk=self.cat.pk)
+        cat.text = 'Попугай на крыше'
+        cat.save()
+        self.assertEqual(self.found('попугай'), [cat])
+        self.assertEqual(self.found('кошка'), [self.cats])
+        Post.objects.get(pk=self.cats.pk).delete()
+        self.assertEqual(self.found('кошка'), [])
+
+    @override_settings(POSTS_PER_PAGE=1)
+    def test_api_cursor(self):
+        """JSON-поиск отдаёт курсор следующей страницы."""
+        url = reverse('posts:search_api')
+        first = self.client.get(url, {'q': 'кошка'}).json()
+        self.assertEqual([row['id'] for row in first['results']],
+                         [self.cats.pk])
+        second = self.client.get(
+            url, {'q': 'кошка', 'cursor': first['next']}
+        ).json()
+        self.assertEqual([row['id'] for row in second['results']],
+                         [self.cat.pk])
+        self.assertIsNone(second['next'])
+
+    def test_admin_uses_index(self):
+        """Поиск в админке идёт через индекс FTS5."""
+        admin = User.objects.create_superuser(
+            'search_admin', 'admin@example.com', 'password'
+        )
+        self.client.force_login(admin)
+        response = self.client.get(
+            reverse('admin:posts_post_changelist'), {'q': 'собака'}
+        )
+        self.assertEqual(response.context['cl'].result_count, 1)
@@ -0,0 +1,95 @@
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import RequestFactory, TestCase, override_settings
+
+from posts import timeline
+from posts.models import Post
+from posts.utils import KeysetPaginator
+
+User = get_user_model()
+
+
+@override_settings(PROFILE_TIMELINE_SIZE=15, POSTS_PER_PAGE=6)
+class TimelineTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='timeline_author')
+        for num in range(20):
+            Post.objects.create(author=cls.author, text=f'Пост {num}')
+
+    def setUp(self):
+        cache.clear()
+        self.factory = RequestFactory()
+        self.author = User.objects.select_related('stats').get(
+            pk=self.author.pk
+        )
+        self.posts = self.author.posts.all()
+
+    def page(self, cursor=None):
+        params = {'cursor': cursor} if cursor else {}
+        request = self.factory.get('/', params)
+        return timeline.profile_page(request, self.author, self.posts)
+
+    def test_pages_match_database(self):
+        """Страницы из кеша и глубже него совпадают с курсором по базе."""
+        paginator = KeysetPaginator(self.posts, 6)
+        expected = paginator.get_page(None)
+        page = self.page()
+        while True:
+            self.assertEqual(page.object_list, expected.object_list)
+            self.assertEqual(page.next_cursor, expected.next_cursor)
+            if not page.has_next():
+                break
+            page = self.page(page.next_cursor)
+            expected = paginator.get_page(expected.next_cursor)
+
+    def test_first_pages_read_by_pk(self):
+        """Тёплый кеш: страница - один запрос по pk, без сортировки."""
+        first = self.page()
+        with self.assertNumQueries(1) as queries:
+            self.page(first.next_cursor)
+        self.assertNotIn('ORDER BY', queries.captured_queries[0]['sql'])
+
+    def test_create_and_delete_update_cache(self):
+        """Новый пост встаёт в начало, удалённый исчезает без пересборки."""
+        timeline.entries(self.author.pk)
+        post = Post.objects.create(author=self.author, text='Свежий')
+        with self.assertNumQueries(0):
+            rows, complete = timeline.entries(self.author.pk)
+        self.assertEqual(rows[0], (post.pub_date, post.pk))
+        self.assertEqual(len(rows), 15)
+        self.assertFalse(complete)
+        post.delete()
+        rows, _ = timeline.entries(self.author.pk)
+        self.assertNotIn(post.pk, [pk for _, pk in rows])
+        self.assertEqual(len(rows), 14)
+
+    def test_moved_post_leaves_timeline(self):
+        """Пост, переданный другому автору, уходит из его ленты."""
+        other = User.objects.create_user(username='timeline_other')
+        timeline.entries(self.author.pk)
+        timeline.entries(other.pk)
+        post = self.posts.first()
+        post.author = other
+        post.save()
+        rows, _ = timeline.entries(self.author.pk)
+        self.assertNotIn(post.pk, [pk for _, pk in rows])
+        rows, complete = timeline.entries(other.pk)
+        self.assertEqual((rows, complete), ([(post.pub_date, post.pk)], True))
+
+    @override_settings(PROFILE_TIMELINE_SIZE=30)
+    def test_stale_build_is_not_served(self):
+        """Полный кеш без нового поста не отдаётся: число постов
+        в AuthorStats с ним не сходится."""
+        timeline.entries(self.author.pk)
+        # Сборка прочитала базу до поста, а записала кеш после add().
+        post = Post.objects.create(author=self.author, text='Свежий')
+        timeline.forget(self.author.pk)
+        cache.set(
+            timeline.timeline_key(self.author.pk),
+            ([row for row in timeline.entries(self.author.pk)[0]
+              if row[1] != post.pk], True)
+        )
+        self.author.stats.refresh_from_db()
+        self.assertEqual(self.page().object_list[0], post)
@@ -0,0 +1,69 @@
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.test import Client, TestCase
+from django.urls import reverse
+from django.utils import timezone
+
+from posts.models import Post
+from posts.utils import KeysetPage, KeysetPaginator
+
+User = get_user_model()
+
+
+class KeysetPaginatorTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.user = User.objects.create_user(username='keyset_user')
+        Post.objects.bulk_create(
+            Post(text=f'Пост {num}', author=cls.user) for num in range(25)
+        )
+        # Одинаковая дата у всех постов: порядок держится на pk.
+        Post.objects.update(pub_date=timezone.now())
+
+    def setUp(self):
+        self.paginator = KeysetPaginator(Post.objects.all(), 10)
+
+    def test_walk_forward_and_back(self):
+        """Курсоры обходят выборку без пропусков и повторов."""
+        expected = list(Post.objects.order_by('-pub_date', '-pk'))
+        seen = []
+        pages = []
+        page = self.paginator.get_page(None)
+        while True:
+            pages.append(page)
+            seen.extend(page.object_list)
+            if not page.has_next():
+                break
+            page = self.paginator.get_page(page.next_cursor)
+        self.assertEqual(seen, expected)
+        self.assertEqual([len(page) for page in pages], [10, 10, 5])
+        self.assertFalse(pages[0].has_previous())
+        back = self.paginator.get_page(pages[2].previous_cursor)
+        self.assertEqual(back.object_list, pages[1].object_list)
+        first = self.paginator.get_page(back.previous_cursor)
+        self.assertEqual(first.object_list, pages[0].object_list)
+        self.assertFalse(first.has_previous())
+
+    def test_broken_cursor_gives_first_page(self):
+        """Испорченный курсор не ломает страницу."""
+        page = self.paginator.get_page('не-курсор')
+        self.assertEqual(
+            page.object_list, self.paginator.get_page(None).object_list
+        )
+
+    def test_views_use_cursor_by_default(self):
+        """Без ?page список отдаётся курсорной страницей."""
+        # Посты созданы bulk_create без сигналов: страница главной из
+        # кеша предыдущих тестов о них не знает.
+        cache.clear()
+        client = Client()
+        response = client.get(reverse('posts:index'))
+        page = response.context['page_obj']
+        self.assertIsInstance(page, KeysetPage)
+        self.assertEqual(len(page), settings.POSTS_PER_PAGE)
+        response = client.get(
+            reverse('posts:index'), {'cursor': page.next_cursor}
+        )
+        self.assertNotIn(page[0], response.context['page_obj'].object_list)
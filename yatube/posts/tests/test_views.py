@@ -1,14 +1,30 @@
+import time
+import warnings
 from http import HTTPStatus
 from django.contrib.auth import get_user_model
-from django.test import Client, TestCase
+from django.core.cache import cache
+from django.core.cache.backends.base import CacheKeyWarning
+from django.db import connection
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
 from django.urls import reverse
 from django.core.files.uploadedfile import SimpleUploadedFile
-from django.core.cache import cache
+from posts import bulk, thumbnails
+from posts.cache import bump, card_key, changed_key, generation
 from posts.forms import PostForm
 from posts.models import Group, Post, Comment, Follow
 
 User = get_user_model()
 
+SMALL_GIF = (
+    b'\x47\x49\x46\x38\x39\x61\x02\x00'
+    b'\x01\x00\x80\x00\x00\x00\x00\x00'
+    b'\xFF\xFF\xFF\x21\xF9\x04\x00\x00'
+    b'\x00\x00\x00\x2C\x00\x00\x00\x00'
+    b'\x02\x00\x01\x00\x00\x02\x02\x0C'
+    b'\x0A\x00\x3B'
+)
+
 
 class PostPagesTests(TestCase):
     @classmethod
@@ -247,6 +263,35 @@ class TestPosts(TestCase):
             self.comment
         )
 
+    @override_settings(COMMENTS_PER_PAGE=2)
+    def test_comments_paginated_without_extra_queries(self):
+        """Комментарии отдаются порциями одним запросом на страницу."""
+        url = reverse('posts:post_detail', kwargs={'post_id': self.post.id})
+        cache.clear()
+        with CaptureQueriesContext(connection) as single:
+            self.guest_client.get(url)
+        Comment.objects.bulk_create(
+            Comment(author=self.user, post=self.post, text=f'Ещё {num}')
+            for num in range(4)
+        )
+        # bulk_create не шлёт сигналов: копию страницы сбрасываем сами.
+        cache.clear()
+        with CaptureQueriesContext(connection) as many:
+            response = self.guest_client.get(url)
+        self.assertEqual(len(single), len(many))
+        page = response.context['comments']
+        self.assertEqual(page.object_list[0], self.comment)
+        self.assertEqual(len(page), 2)
+        response = self.guest_client.get(
+            reverse('posts:post_comments', kwargs={'post_id': self.post.id}),
+            {'cursor': page.next_cursor}
+        )
+        self.assertEqual(
+            [comment.text for comment in response.context['comments']],
+            ['Ещё 1', 'Ещё 2']
+        )
+        self.assertContains(response, 'Показать ещё')
+
     def test_index_page_cache(self):
         """Проверка кеширования главной страницы."""
         post = Post.objects.create(
@@ -257,16 +302,32 @@ class TestPosts(TestCase):
         first_response = self.auth_client_author.get(
             reverse(f'{"posts:index"}')
         )
-        Post.objects.filter(id=post.id).delete()
+        # update() не шлёт сигналов - фрагмент остаётся в кеше.
+        Post.objects.filter(id=post.id).update(text='Изменённый пост')
         response_cached = self.auth_client_author.get(
             reverse(f'{"posts:index"}')
         )
         self.assertEqual(first_response.content, response_cached.content)
-        cache.clear()
+        # Удаление через модель сразу сбрасывает поколение списка.
+        Post.objects.get(id=post.id).delete()
         second_response = self.auth_client_author.get(
             reverse(f'{"posts:index"}')
         )
         self.assertNotEqual(second_response.content, response_cached.content)
+        self.assertNotContains(second_response, 'Кеширский пост')
+
+    def test_group_page_cache_follows_edit(self):
+        """Пост, перенесённый в другую группу, уходит из кеша старой."""
+        post = Post.objects.create(
+            author=TestPosts.user2,
+            group=TestPosts.group,
+            text='Пост для переноса',
+        )
+        url = reverse('posts:group_list', kwargs={'slug': self.group.slug})
+        self.assertContains(self.auth_client_author.get(url), post.text)
+        post.group = None
+        post.save()
+        self.assertNotContains(self.auth_client_author.get(url), post.text)
 
     def test_page_not_found(self):
         """Сервер возвращает код 404, если страница не найдена."""
@@ -299,3 +360,305 @@ class TestPosts(TestCase):
         )
         response = self.auth_client_author.get(reverse('posts:follow_index'))
         self.assertNotIn(post, response.context['page_obj'].object_list)
+
+
+class AnonymousPageCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='page_author')
+        cls.reader = User.objects.create_user(username='page_reader')
+        cls.group = Group.objects.create(title='Группа', slug='page-group')
+        cls.post = Post.objects.create(
+            author=cls.author, group=cls.group, text='Первый пост'
+        )
+
+    def setUp(self):
+        self.guest_client = Client()
+
+    def test_repeat_visit_skips_database(self):
+        """Повторная страница для гостя отдаётся без запросов к базе."""
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+        ]
+        for url in urls:
+            with self.subTest(url=url):
+                first = self.guest_client.get(url)
+                with CaptureQueriesContext(connection) as queries:
+                    second = self.guest_client.get(url)
+                self.assertEqual(len(queries), 0)
+                self.assertEqual(first.content, second.content)
+                self.assertIn('Cookie', second['Vary'])
+
+    def test_changes_purge_pages(self):
+        """Новый пост, комментарий и подписка видны гостю сразу."""
+        detail = reverse('posts:post_detail', args=[self.post.pk])
+        profile = reverse('posts:profile', args=[self.author.username])
+        for url in (reverse('posts:index'), detail, profile):
+            self.guest_client.get(url)
+        Post.objects.create(author=self.author, text='Свежий пост')
+        self.assertContains(
+            self.guest_client.get(reverse('posts:index')), 'Свежий пост'
+        )
+        Comment.objects.create(
+            author=self.reader, post=self.post, text='Свежий комментарий'
+        )
+        self.assertContains(
+            self.guest_client.get(detail), 'Свежий комментарий'
+        )
+        Follow.objects.create(user=self.reader, author=self.author)
+        self.assertContains(self.guest_client.get(profile), 'Подписчиков: 1')
+
+    def test_renames_purge_pages(self):
+        """Новое имя автора и группы видно на всех страницах сразу."""
+        Comment.objects.create(
+            author=self.reader, post=self.post, text='Комментарий'
+        )
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:group_list', args=[self.group.slug]),
+            reverse('posts:profile', args=[self.author.username]),
+            reverse('posts:post_detail', args=[self.post.pk]),
+        ]
+        for url in urls:
+            self.guest_client.get(url)
+        author = User.objects.get(pk=self.author.pk)
+        author.first_name = 'Переименованный'
+        author.save()
+        reader = User.objects.get(pk=self.reader.pk)
+        reader.username = 'renamed_reader'
+        reader.save()
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url), 'Переименованный'
+                )
+        self.assertContains(self.guest_client.get(urls[3]), 'renamed_reader')
+        group = Group.objects.get(pk=self.group.pk)
+        group.slug = 'renamed-group'
+        group.save()
+        for url in urls[:1] + urls[2:]:
+            with self.subTest(url=url):
+                self.assertContains(
+                    self.guest_client.get(url), 'renamed-group'
+                )
+
+    def test_group_delete_purges_pages(self):
+        """Удалённая группа пропадает со страниц и из кеша гостей."""
+        group = Group.objects.create(title='Временная', slug='temporary')
+        Post.objects.create(author=self.author, group=group, text='В группе')
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:profile', args=[self.author.username]),
+        ]
+        group_url = reverse('posts:group_list', args=['temporary'])
+        for url in urls + [group_url]:
+            self.assertContains(self.guest_client.get(url), group_url)
+        group.delete()
+        self.assertEqual(self.guest_client.get(group_url).status_code, 404)
+        for url in urls:
+            with self.subTest(url=url):
+                self.assertNotContains(self.guest_client.get(url), group_url)
+
+    def test_scope_keys_are_valid(self):
+        """Ключи списков годятся для memcached при любом slug."""
+        with warnings.catch_warnings():
+            warnings.simplefilter('error', CacheKeyWarning)
+            bump('group', 'Тестовый слаг ' + 'x' * 250)
+            generation('author', 'автор с пробелом')
+
+    def test_login_keeps_pages(self):
+        """Вход пользователя не сбрасывает кеш его постов."""
+        self.guest_client.get(reverse('posts:index'))
+        version = Post.objects.get(pk=self.post.pk).updated_at
+        self.client.force_login(self.author)
+        User.objects.get(pk=self.author.pk).save(update_fields=['last_login'])
+        self.assertEqual(
+            Post.objects.get(pk=self.post.pk).updated_at, version
+        )
+
+    def test_logged_in_user_bypasses_cache(self):
+        """Вошедший пользователь не получает копию для гостей."""
+        url = reverse('posts:index')
+        self.guest_client.get(url)
+        client = Client()
+        client.force_login(self.reader)
+        response = client.get(url)
+        self.assertContains(response, self.reader.username)
+        self.assertIn('Cookie', response['Vary'])
+
+
+class ConditionalGetTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='etag_author')
+        cls.post = Post.objects.create(author=cls.author, text='Пост')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.detail = reverse('posts:post_detail', args=[self.post.pk])
+
+    def test_post_detail_not_modified(self):
+        """Повтор с ETag даёт 304, правка поста и комментарий - 200."""
+        response = self.client.get(self.detail)
+        etag = response['ETag']
+        self.assertTrue(response.has_header('Last-Modified'))
+        response = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.post.text = 'Исправленный пост'
+        self.post.save()
+        response = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        etag = response['ETag']
+        Comment.objects.create(author=self.author, post=self.post, text='К')
+        response = self.client.get(self.detail, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+
+    def test_delete_moves_last_modified(self):
+        """Удаление свежего поста не даёт 304 по If-Modified-Since."""
+        url = reverse('posts:index')
+        newest = Post.objects.create(author=self.author, text='Свежий')
+        response = self.client.get(url)
+        modified = response['Last-Modified']
+        newest.delete()
+        response = self.client.get(url, HTTP_IF_MODIFIED_SINCE=modified)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotContains(response, 'Свежий')
+
+    def test_renditions_change_etag(self):
+        """Готовые варианты картинки меняют ETag страниц с заглушкой."""
+        post = Post.objects.create(
+            author=self.author, text='С картинкой',
+            image=SimpleUploadedFile('etag.gif', SMALL_GIF, 'image/gif')
+        )
+        urls = [
+            reverse('posts:index'),
+            reverse('posts:post_detail', args=[post.pk]),
+        ]
+        etags = {url: self.client.get(url)['ETag'] for url in urls}
+        thumbnails.generate(post.pk)
+        for url in urls:
+            with self.subTest(url=url):
+                response = self.client.get(
+                    url, HTTP_IF_NONE_MATCH=etags[url]
+                )
+                self.assertEqual(response.status_code, 200)
+                self.assertNotContains(response, 'Изображение обрабатывается')
+
+    def test_list_last_modified(self):
+        """Last-Modified списка - самая поздняя правка в его окне
+        или запись в список; без новых записей повтор даёт 304."""
+        url = reverse('posts:index')
+        # Последняя запись в список - несколько секунд назад: ответ той
+        # же секунды получил бы Last-Modified раньше этой записи.
+        cache.set(changed_key('index'), int(time.time()) - 5, None)
+        response = self.client.get(url)
+        last_modified = response['Last-Modified']
+        response = self.client.get(
+            url, HTTP_IF_MODIFIED_SINCE=last_modified
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_anonymous_copy_answers_304_without_queries(self):
+        """Гостю 304 отдаётся из копии страницы, не трогая базу."""
+        guest = Client()
+        url = reverse('posts:index')
+        etag = guest.get(url)['ETag']
+        with CaptureQueriesContext(connection) as queries:
+            response = guest.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(len(queries), 0)
+
+
+class PostCardCacheTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='card_author')
+        cls.group = Group.objects.create(title='Группа', slug='card-group')
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.author)
+        self.post = Post.objects.create(
+            author=self.author, group=self.group, text='Карточка'
+        )
+
+    def test_card_shared_between_lists(self):
+        """Карточку, собранную для главной, берут и другие списки."""
+        self.client.get(reverse('posts:index'))
+        self.assertIsNotNone(cache.get(card_key(self.post)))
+        # update() не шлёт сигналов: карточка остаётся прежней.
+        Post.objects.filter(pk=self.post.pk).update(text='Без сигналов')
+        response = self.client.get(
+            reverse('posts:group_list', args=[self.group.slug])
+        )
+        self.assertContains(response, 'Карточка')
+
+    def test_save_and_delete_forget_card(self):
+        """Правка и удаление поста убирают именно его карточку."""
+        other = Post.objects.create(author=self.author, text='Соседний')
+        self.client.get(reverse('posts:index'))
+        old_key = card_key(self.post)
+        self.post.text = 'Исправленная карточка'
+        self.post.save()
+        self.assertIsNone(cache.get(old_key))
+        self.assertIsNotNone(cache.get(card_key(other)))
+        self.assertContains(
+            self.client.get(reverse('posts:index')), 'Исправленная карточка'
+        )
+        key = card_key(self.post)
+        self.post.delete()
+        self.assertIsNone(cache.get(key))
+
+
+class ProfileQueriesTests(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        super().setUpClass()
+        cls.author = User.objects.create_user(username='profile_author')
+        cls.reader = User.objects.create_user(username='profile_reader')
+        Follow.objects.create(user=cls.reader, author=cls.author)
+
+    def setUp(self):
+        self.client = Client()
+        self.client.force_login(self.reader)
+        self.url = reverse('posts:profile', args=[self.author.username])
+
+    def test_constant_queries(self):
+        """Сессия, пользователь, автор и страница постов.
+
+        При холодном кеше добавляется сборка ленты автора. Число
+        запросов не зависит от количества постов и подписок.
+        """
+        Post.objects.create(author=self.author, text='Первый')
+        cache.clear()
+        with self.assertNumQueries(5):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Отписаться')
+        bulk.posts_inserted(Post.objects.bulk_create(
+            Post(author=self.author, text=f'Пост {num}') for num in range(15)
+        ))
+        for num in range(5):
+            follower = User.objects.create_user(username=f'follower_{num}')
+            Follow.objects.create(user=follower, author=self.author)
+        cache.clear()
+        with self.assertNumQueries(5):
+            self.client.get(self.url)
+        # Лента автора уже в кеше: посты читаются по pk.
+        Post.objects.create(author=self.author, text='Новый')
+        with self.assertNumQueries(4):
+            response = self.client.get(self.url)
+        self.assertContains(response, 'Новый')
+
+    def test_header_follows_subscription(self):
+        """Кеш шапки учитывает подписку и её счётчики."""
+        self.client.get(self.url)
+        Follow.objects.filter(user=self.reader).delete()
+        response = self.client.get(self.url)
+        self.assertContains(response, 'Подписаться')
+        self.assertContains(response, 'Подписчиков: 0')
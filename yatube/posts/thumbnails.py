@@ -0,0 +1,123 @@
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import close_old_connections, connections, transaction
+from django.utils import timezone
+
+from . import cache, renditions
+from .models import Post, Rendition
+
+logger = logging.getLogger(__name__)
+
+_executor = None
+_executor_lock = threading.Lock()
+
+
+def executor():
+    """Общий пул потоков для подготовки картинок (без брокера)."""
+    global _executor
+    with _executor_lock:
+        if _executor is None:
+            _executor = ThreadPoolExecutor(
+                max_workers=settings.THUMBNAIL_WORKERS,
+                thread_name_prefix='thumbnails'
+            )
+    return _executor
+
+
+def rendition_name(post, width, image_format):
+    """Имя файла варианта; хеш содержимого делает адрес неизменяемым."""
+    stem = os.path.splitext(os.path.basename(post.image.name))[0]
+    if post.image_hash:
+        stem = f'{stem}-{post.image_hash[:12]}'
+    return f'renditions/posts/{post.pk}/{stem}-{width}.{image_format}'
+
+
+def generate(post_id):
+    """Строит варианты картинки поста нужных ширин и форматов.
+
+    Новые файлы и строки готовятся рядом со старыми и подменяют их
+    одной транзакцией: пока идёт сборка, страницы показывают прежние
+    варианты, а не заглушку. Файлы старых вариантов удаляются после.
+
+    Задачи одного поста могут пересечься (повторная загрузка, пул
+    потоков, build_renditions --workers). Подмена начинается с UPDATE
+    поста при той же картинке: он и блокирует пост до конца
+    транзакции, и отбрасывает задачу, чью картинку уже заменили, -
+    тогда её файлы удаляются, а варианты строит задача новой картинки.
+    """
+    post = Post.objects.select_related('author', 'group').filter(
+        pk=post_id
+    ).first()
+    if post is None:
+        return
+    if not post.image and not post.renditions.exists():
+        return
+    created = []
+    if post.image:
+        with post.image.open('rb') as file:
+            variants = list(renditions.build(
+                file, settings.POST_IMAGE_WIDTHS, settings.POST_IMAGE_SIZE
+            ))
+        for width, height, image_format, content in variants:
+            # Занятое имя storage заменит свободным: старый файл ещё
+            # отдаётся страницам.
+            path = default_storage.save(
+                rendition_name(post, width, image_format),
+                ContentFile(content)
+            )
+            created.append(Rendition(
+                post=post, name='card', source=post.image.name, path=path,
+                url=default_storage.url(path), format=image_format,
+                width=width, height=height
+            ))
+    with transaction.atomic():
+        # Новая версия поста: фрагменты, карточка и ETag страниц были
+        # построены с заглушкой или прежними вариантами.
+        current = Post.objects.filter(
+            pk=post.pk, image=post.image.name or ''
+        ).update(updated_at=timezone.now())
+        if current:
+            replaced = Rendition.objects.filter(post=post)
+            stale = list(replaced.values_list('path', flat=True))
+            replaced.delete()
+            Rendition.objects.bulk_create(created)
+        else:
+            stale = [rendition.path for rendition in created]
+    for path in stale:
+        if path:
+            default_storage.delete(path)
+    if not current:
+        return
+    cache.forget_card(post)
+    for scope in cache.post_scopes(post):
+        cache.bump(*scope)
+
+
+def _run(post_id):
+    close_old_connections()
+    try:
+        generate(post_id)
+    except Exception:
+        logger.exception('Не удалось подготовить миниатюры поста %s', post_id)
+    finally:
+        connections.close_all()
+
+
+def schedule(post):
+    """Ставит подготовку миниатюр в очередь после фиксации транзакции.
+
+    Вызывается сигналом сохранения поста при смене картинки, так что
+    миниатюры получают посты из формы, админки и objects.create.
+
+    При THUMBNAIL_WORKERS = 0 миниатюры строятся сразу в запросе.
+    """
+    if not settings.THUMBNAIL_WORKERS:
+        generate(post.pk)
+        return
+    transaction.on_commit(lambda: executor().submit(_run, post.pk))
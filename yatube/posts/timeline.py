@@ -0,0 +1,125 @@
+"""Кеш последних постов автора для первых страниц профиля.
+
+Под ключом timeline:<id автора> лежат пары (pub_date, pk) самых
+новых постов по убыванию и признак, что это все посты автора. Кеш
+собирается одним запросом при первом чтении, а дальше меняется
+сигналами: новый пост вставляется, удалённый убирается. Страница
+профиля, которая целиком помещается в кеш, читается по pk без
+сортировки; остальные идут в базу обычным курсором.
+
+Перед отдачей кеш сверяется с AuthorStats.posts_count: так ловятся
+и посты, добавленные мимо сигналов, и сборка, которая прочитала базу
+до нового поста, а записала кеш после него.
+"""
+from django.conf import settings
+from django.core.cache import cache
+
+from .models import AuthorStats, Post
+from .utils import KeysetPaginator, paginate_page
+
+
+def timeline_key(author_id):
+    return f'timeline:{author_id}'
+
+
+def entries(author_id):
+    """([(pub_date, pk), ...] по убыванию, все ли это посты автора)."""
+    key = timeline_key(author_id)
+    timeline = cache.get(key)
+    if timeline is None:
+        size = settings.PROFILE_TIMELINE_SIZE
+        rows = list(
+            Post.objects.filter(author_id=author_id).order_by(
+                '-pub_date', '-pk'
+            ).values_list('pub_date', 'pk')[:size + 1]
+        )
+        timeline = (rows[:size], len(rows) <= size)
+        # add(), успевший обновить кеш, пока шёл запрос, важнее.
+        if not cache.add(key, timeline, settings.CACHES_TIME):
+            timeline = cache.get(key, timeline)
+    return timeline
+
+
+def add(post):
+    """Вставляет новый пост, если он попадает в закешированное начало."""
+    key = timeline_key(post.author_id)
+    timeline = cache.get(key)
+    if timeline is None:
+        return
+    rows, complete = timeline
+    entry = (post.pub_date, post.pk)
+    if not complete and (not rows or entry < rows[-1]):
+        # Пост старше известного начала ленты: между ними могут быть
+        # посты, которых нет в кеше.
+        return
+    rows = sorted(rows + [entry], reverse=True)
+    size = settings.PROFILE_TIMELINE_SIZE
+    if len(rows) > size:
+        rows, complete = rows[:size], False
+    cache.set(key, (rows, complete), settings.CACHES_TIME)
+
+
+def remove(post):
+    key = timeline_key(post.author_id)
+    timeline = cache.get(key)
+    if timeline is None:
+        return
+    rows, complete = timeline
+    rows = [row for row in rows if row[1] != post.pk]
+    if rows or complete:
+        cache.set(key, (rows, complete), settings.CACHES_TIME)
+    else:
+        forget(post.author_id)
+
+
+def forget(author_id):
+    """Сбрасывает кеш автора (после bulk_create, минуя сигналы)."""
+    cache.delete(timeline_key(author_id))
+
+
+def matches_count(rows, complete, author):
+    """Сходится ли кеш с числом постов автора из AuthorStats."""
+    try:
+        posts_count = author.stats.posts_count
+    except AuthorStats.DoesNotExist:
+        return True
+    if complete:
+        return len(rows) == posts_count
+    return posts_count > settings.PROFILE_TIMELINE_SIZE
+
+
+def profile_page(request, author, posts):
+    """Страница постов профиля: из кеша ленты или из базы.
+
+    Первая страница и переходы «дальше» в пределах закешированного
+    начала - один запрос pk__in. Нумерованные страницы, шаг назад и
+    страницы глубже кеша - обычная пагинация.
+    """
+    if 'page' in request.GET:
+        return paginate_page(request, posts)
+    paginator = KeysetPaginator(posts, settings.POSTS_PER_PAGE)
+    cursor = request.GET.get('cursor')
+    decoded = paginator.decode_cursor(cursor)
+    if decoded is not None and decoded[0] != 'next':
+        return paginator.get_page(cursor)
+    values = decoded[1] if decoded else None
+    rows, complete = entries(author.pk)
+    if not matches_count(rows, complete, author):
+        forget(author.pk)
+        return paginator.get_page(cursor)
+    if values is not None:
+        rows = [row for row in rows if row < tuple(values)]
+    per_page = paginator.per_page
+    if len(rows) <= per_page and not complete:
+        return paginator.get_page(cursor)
+    ids = [pk for _, pk in rows[:per_page]]
+    found = posts.in_bulk(ids)
+    if len(found) != len(ids):
+        # Кеш разошёлся с базой: в нём есть пост, удалённый или
+        # переданный другому автору без сигналов.
+        forget(author.pk)
+        return paginator.get_page(cursor)
+    return paginator.build_page(
+        [found[pk] for pk in ids], len(rows) > per_page,
+        cursor if decoded else None, values
+    )
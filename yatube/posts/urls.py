@@ -1,5 +1,5 @@
 from django.urls import path
-from . import views
+from . import api, feeds, views
 
 app_name = 'posts'
 
@@ -22,12 +22,64 @@ urlpatterns = [
         views.delete_post,
         name='delete_post'
     ),
+    # Comments
+    path(
+        'posts/<int:post_id>/comments/',
+        views.post_comments,
+        name='post_comments'
+    ),
     # Add comment
     path(
         'posts/<int:post_id>/comment/',
         views.add_comment,
         name='add_comment'
     ),
+    # Search
+    path('search/', views.search, name='search'),
+    path('search/api/', views.search_api, name='search_api'),
+    # Feeds
+    path('rss/', feeds.cached_feed(feeds.LatestPostsFeed), name='index_rss'),
+    path(
+        'atom/', feeds.cached_feed(feeds.LatestPostsAtomFeed),
+        name='index_atom'
+    ),
+    path(
+        'group/<slug:slug>/rss/',
+        feeds.cached_feed(feeds.GroupPostsFeed),
+        name='group_rss'
+    ),
+    path(
+        'group/<slug:slug>/atom/',
+        feeds.cached_feed(feeds.GroupPostsAtomFeed),
+        name='group_atom'
+    ),
+    path(
+        'profile/<str:username>/rss/',
+        feeds.cached_feed(feeds.AuthorPostsFeed),
+        name='profile_rss'
+    ),
+    path(
+        'profile/<str:username>/atom/',
+        feeds.cached_feed(feeds.AuthorPostsAtomFeed),
+        name='profile_atom'
+    ),
+    # JSON API
+    path('api/posts/', api.index, name='api_index'),
+    path('api/group/<slug:slug>/', api.group_posts, name='api_group_list'),
+    path(
+        'api/profile/<str:username>/', api.profile, name='api_profile'
+    ),
+    path(
+        'api/posts/<int:post_id>/', api.post_detail, name='api_post_detail'
+    ),
+    path(
+        'api/posts/<int:post_id>/comments/',
+        api.post_comments,
+        name='api_post_comments'
+    ),
+    path('api/follow/', api.follow_index, name='api_follow_index'),
+    # Export
+    path('export/posts/', views.export_posts, name='export_posts'),
     # Follow
     path('follow/', views.follow_index, name='follow_index'),
     path(
@@ -1,9 +1,171 @@
-from django.core.paginator import Paginator
+import base64
+import binascii
 
 from django.conf import settings
+from django.core.exceptions import ValidationError
+from django.core.paginator import Page, Paginator
+from django.db.models import Q, QuerySet
 
+CURSOR_SEPARATOR = '|'
 
-def paginate_page(request, post_list):
-    paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
-    page_number = request.GET.get("page")
-    return paginator.get_page(page_number)
+
+class KeysetPage(Page):
+    """Страница курсорной пагинации.
+
+    Номера страницы нет: вместо него страница знает курсоры
+    соседних страниц, которые передаются в GET-параметре `cursor`.
+    """
+
+    def __init__(self, object_list, paginator, cursor=None,
+                 next_cursor=None, previous_cursor=None):
+        super().__init__(object_list, None, paginator)
+        self.cursor = cursor or ''
+        self.next_cursor = next_cursor
+        self.previous_cursor = previous_cursor
+
+    def __repr__(self):
+        return '<Keyset page %r>' % self.cursor
+
+    def has_next(self):
+        return self.next_cursor is not None
+
+    def has_previous(self):
+        return self.previous_cursor is not None
+
+    def next_page_number(self):
+        return self.next_cursor
+
+    def previous_page_number(self):
+        return self.previous_cursor
+
+    def start_index(self):
+        return None
+
+    def end_index(self):
+        return None
+
+
+class KeysetPaginator(Paginator):
+    """Пагинатор по ключу сортировки вместо OFFSET/COUNT.
+
+    `ordering` - поля, однозначно упорядочивающие выборку, например
+    ('-pub_date', '-pk'). Каждая страница - это один запрос
+    `WHERE (ключ) < (ключ последней строки) LIMIT per_page + 1`,
+    поэтому её стоимость не зависит от глубины.
+    """
+    page_class = KeysetPage
+
+    def __init__(self, object_list, per_page, ordering=('-pub_date', '-pk'),
+                 **kwargs):
+        super().__init__(object_list, per_page, **kwargs)
+        self.ordering = tuple(ordering)
+
+    def _fields(self):
+        return [name.lstrip('-') for name in self.ordering]
+
+    def _model_field(self, name):
+        meta = self.object_list.model._meta
+        return meta.pk if name == 'pk' else meta.get_field(name)
+
+    def parse_value(self, name, value):
+        """Значение ключа из строки курсора."""
+        return self._model_field(name).to_python(value)
+
+    def encode_cursor(self, obj, direction):
+        values = [str(getattr(obj, name)) for name in self._fields()]
+        raw = CURSOR_SEPARATOR.join([direction] + values)
+        return base64.urlsafe_b64encode(raw.encode()).decode().rstrip('=')
+
+    def decode_cursor(self, cursor):
+        """Возвращает (направление, значения ключа) или None."""
+        if not cursor:
+            return None
+        try:
+            padded = cursor + '=' * (-len(cursor) % 4)
+            raw = base64.urlsafe_b64decode(padded.encode()).decode()
+            direction, *values = raw.split(CURSOR_SEPARATOR)
+            if direction not in ('next', 'prev'):
+                return None
+            fields = self._fields()
+            if len(values) != len(fields):
+                return None
+            values = [
+                self.parse_value(name, value)
+                for name, value in zip(fields, values)
+            ]
+        except (binascii.Error, UnicodeDecodeError, ValueError,
+                ValidationError):
+            return None
+        return direction, values
+
+    def _after(self, values, ordering):
+        """Условие «строго после ключа values» в порядке ordering."""
+        condition = Q()
+        for index in reversed(range(len(ordering))):
+            name = ordering[index].lstrip('-')
+            lookup = 'lt' if ordering[index].startswith('-') else 'gt'
+            step = Q(**{f'{name}__{lookup}': values[index]})
+            if index < len(ordering) - 1:
+                step |= Q(**{name: values[index]}) & condition
+            condition = step
+        return condition
+
+    def _fetch(self, values, backwards):
+        ordering = self.ordering
+        if backwards:
+            ordering = tuple(
+                name[1:] if name.startswith('-') else '-' + name
+                for name in ordering
+            )
+        queryset = self.object_list.order_by(*ordering)
+        if values is not None:
+            queryset = queryset.filter(self._after(values, ordering))
+        return list(queryset[:self.per_page + 1])
+
+    def get_page(self, cursor):
+        decoded = self.decode_cursor(cursor)
+        direction, values = decoded if decoded else ('next', None)
+        backwards = direction == 'prev'
+        rows = self._fetch(values, backwards)
+        has_more = len(rows) > self.per_page
+        rows = rows[:self.per_page]
+        if backwards:
+            if not has_more:
+                # Дошли до начала выборки - это первая страница.
+                return self.get_page(None)
+            rows.reverse()
+        return self.build_page(
+            rows, has_more, cursor if decoded else None, values, backwards
+        )
+
+    def build_page(self, rows, has_more, cursor=None, values=None,
+                   backwards=False):
+        """Страница из уже выбранных строк (в порядке ordering).
+
+        values - ключ курсора, после которого идут строки (None для
+        первой страницы); has_more - есть ли строки дальше.
+        """
+        next_cursor = previous_cursor = None
+        if rows:
+            if has_more or backwards:
+                next_cursor = self.encode_cursor(rows[-1], 'next')
+            if values is not None:
+                previous_cursor = self.encode_cursor(rows[0], 'prev')
+        return self.page_class(
+            rows, self, cursor, next_cursor, previous_cursor
+        )
+
+
+def paginate_page(request, post_list, ordering=('-pub_date', '-pk')):
+    """Страница выборки для шаблона.
+
+    По умолчанию используется курсорная пагинация. Нумерованные
+    страницы (`?page=N`) остаются для старых ссылок и для выборок,
+    которые не являются QuerySet (например, небольших списков).
+    """
+    page_number = request.GET.get('page')
+    if page_number is not None or not isinstance(post_list, QuerySet):
+        paginator = Paginator(post_list, settings.POSTS_PER_PAGE)
+        return paginator.get_page(page_number)
+    paginator = KeysetPaginator(post_list, settings.POSTS_PER_PAGE, ordering)
+    return paginator.get_page(request.GET.get('cursor'))
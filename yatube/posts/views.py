@@ -1,67 +1,219 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models import DateTimeField, Exists, Max, OuterRef, Subquery
+from django.contrib.admin.views.decorators import staff_member_required
+from django.http import (
+    HttpResponseBadRequest, JsonResponse, StreamingHttpResponse
+)
 from django.shortcuts import render, get_object_or_404, redirect
+from django.template.response import TemplateResponse
 from .models import Post, Group, User, Comment, Follow
 from .forms import PostForm, CommentForm
 from django.contrib.auth.decorators import login_required
-from .utils import paginate_page
+from .utils import KeysetPaginator, paginate_page
+from . import timeline
+from .feed import follow_feed_page
+from .cache import (
+    anonymous_page, conditional_page, fragment_context, generation
+)
+from .search import search_page
+from .export import FORMATS, export_lines
 
+def post_detail_scopes(post_id):
+    """Пост, а также автор и группа, чьи данные видны на его странице."""
+    scopes = [('post', post_id)]
+    row = Post.objects.filter(pk=post_id).values_list(
+        'author__username', 'group__slug'
+    ).first()
+    if row is not None:
+        username, slug = row
+        scopes.append(('author', username))
+        if slug:
+            scopes.append(('group', slug))
+    return scopes
+
+
+def window_versions(posts):
+    """Версии для conditional_page: pk и updated_at постов страницы.
+
+    posts(**kwargs) - выборка списка; окно берётся тем же курсором или
+    номером страницы, что и в самом view, но без картинок и связей.
+    Номер страницы превращается в срез без COUNT; пустое окно или
+    неверный номер оставляют ответ без ETag. Без условного запроса
+    окно не выбирается: версии даёт page_obj ответа (rendered).
+    """
+    def versions(request, **kwargs):
+        window = posts(**kwargs).only('pub_date', 'updated_at')
+        number = request.GET.get('page')
+        if number is None:
+            window = paginate_page(request, window)
+        else:
+            try:
+                start = (int(number) - 1) * settings.POSTS_PER_PAGE
+            except ValueError:
+                return None
+            if start < 0:
+                return None
+            window = window[start:start + settings.POSTS_PER_PAGE]
+        return page_version(window)
+
+    def rendered(response):
+        """Те же версии из страницы, которую view уже загрузил."""
+        if response.status_code != 200:
+            return None
+        return page_version(response.context_data['page_obj'])
+
+    versions.rendered = rendered
+    return versions
+
+
+def page_version(posts):
+    rows = [(post.pk, post.updated_at) for post in posts]
+    if not rows:
+        return None
+    return rows, max(stamp for _, stamp in rows)
+
+
+def post_detail_versions(request, post_id):
+    """Пост, его последний комментарий и то, что видно рядом с ним."""
+    last_comment = Comment.objects.filter(
+        post=OuterRef('pk')
+    ).order_by().values('post').annotate(
+        last=Max('updated_at')
+    ).values('last')
+    row = Post.objects.filter(pk=post_id).annotate(
+        last_comment=Subquery(last_comment, output_field=DateTimeField())
+    ).values_list(
+        'updated_at', 'last_comment', 'comments_count',
+        'author__stats__posts_count', 'group__title', 'author__username'
+    ).first()
+    if row is None:
+        return None
+    updated_at, last_comment = row[:2]
+    # Имя автора на странице меняется без правки поста: его поколение
+    # сбрасывается сигналом сохранения пользователя.
+    parts = [*row, generation('author', row[-1])]
+    return parts, max(updated_at, last_comment or updated_at)
+
+
+def index_scopes():
+    return [('index',)]
+
+
+@anonymous_page(index_scopes)
+@conditional_page(window_versions(lambda: Post.objects.all()), index_scopes)
 def index(request):
     posts = Post.objects.select_related('group', 'author')
     page_obj = paginate_page(request, posts)
     context = {
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        **fragment_context('index'),
     }
-    return render(request, 'posts/index.html', context)
+    return TemplateResponse(request, 'posts/index.html', context)
 
 
+@anonymous_page(lambda slug: [('group', slug)])
+@conditional_page(
+    window_versions(lambda slug: Post.objects.filter(group__slug=slug)),
+    lambda slug: [('group', slug)]
+)
 def group_posts(request, slug):
     group = get_object_or_404(Group, slug=slug)
-    posts = group.posts.select_related("author", "group")
+    posts = group.posts.select_related('author', 'group')
     page_obj = paginate_page(request, posts)
     context = {
         'group': group,
-        'page_obj': page_obj
+        'page_obj': page_obj,
+        **fragment_context('group', group.slug),
     }
-    return render(request, 'posts/group_list.html', context)
+    return TemplateResponse(request, 'posts/group_list.html', context)
+
+
+def profile_scopes(username):
+    return [('author', username), ('profile', username)]
 
 
+@anonymous_page(profile_scopes)
+@conditional_page(
+    window_versions(
+        lambda username: Post.objects.filter(author__username=username)
+    ),
+    profile_scopes
+)
 def profile(request, username):
-    author = get_object_or_404(User, username=username)
-    posts = author.posts.select_related('group', 'author')
-    page_obj = paginate_page(request, posts)
+    """Профиль за постоянное число запросов: автор одним запросом
+    (счётчики из AuthorStats, подписка - EXISTS) и страница постов,
+    первые страницы - по pk из кеша ленты автора (posts.timeline).
+    """
+    authors = User.objects.select_related('stats')
     if request.user.is_authenticated:
-        following = request.user.follower.filter(author=author).exists()
-    else:
-        following = False
+        authors = authors.annotate(is_following=Exists(
+            Follow.objects.filter(user=request.user, author=OuterRef('pk'))
+        ))
+    author = get_object_or_404(authors, username=username)
+    posts = author.posts.select_related('group', 'author')
+    page_obj = timeline.profile_page(request, author, posts)
     context = {
         'author': author,
         'page_obj': page_obj,
-        'following': following
+        'following': getattr(author, 'is_following', False),
+        'header_cache_time': settings.PROFILE_HEADER_CACHE_TIME,
+        'header_generation': generation('profile', author.username),
+        **fragment_context('author', author.username),
     }
-    return render(request, 'posts/profile.html', context)
+    return TemplateResponse(request, 'posts/profile.html', context)
+
+
+def comments_page(request, post_id):
+    """Страница комментариев поста: курсор по (created, id)."""
+    comments = Comment.objects.filter(post_id=post_id).select_related(
+        'author'
+    )
+    paginator = KeysetPaginator(
+        comments, settings.COMMENTS_PER_PAGE, ordering=('created', 'pk')
+    )
+    return paginator.get_page(request.GET.get('cursor'))
 
 
+@anonymous_page(post_detail_scopes)
+@conditional_page(
+    post_detail_versions, lambda post_id: [('post', post_id)]
+)
 def post_detail(request, post_id):
-    post = get_object_or_404(Post, pk=post_id)
+    post = get_object_or_404(
+        Post.objects.select_related(
+            'author__stats', 'group'
+        ).prefetch_related('renditions'),
+        pk=post_id)
     author = post.author
     form = CommentForm(request.POST or None)
-    comments = Comment.objects.filter(post=post)
     context = {
         'author': author,
         'post': post,
         'form': form,
-        'comments': comments
+        'comments': comments_page(request, post_id)
     }
     return render(request, 'posts/post_detail.html', context)
 
 
+def post_comments(request, post_id):
+    """Следующая порция комментариев для кнопки «Показать ещё»."""
+    get_object_or_404(Post.objects.only('pk'), pk=post_id)
+    context = {
+        'post_id': post_id,
+        'comments': comments_page(request, post_id),
+    }
+    return render(request, 'posts/includes/comments.html', context)
+
+
 @login_required
 def post_create(request):
     form = PostForm(request.POST, files=request.FILES or None)
     if request.method == 'POST':
         if form.is_valid():
-            post = form.save(commit=False)
-            post.author = request.user
-            post.save()
+            form.instance.author = request.user
+            with transaction.atomic():
+                post = form.save()
             return redirect('posts:profile', post.author)
     context = {
         'is_edit': False,
@@ -79,7 +231,8 @@ def post_edit(request, post_id):
         files=request.FILES or None,
         instance=post)
     if form.is_valid():
-        form.save()
+        with transaction.atomic():
+            form.save()
         return redirect("posts:post_detail", post_id)
     context = {
         'is_edit': True,
@@ -93,7 +246,8 @@ def post_edit(request, post_id):
 def delete_post(request, post_id):
     post = Post.objects.get(id=post_id)
     if request.user == post.author:
-        post.delete()
+        with transaction.atomic():
+            post.delete()
     return redirect('posts:index')
 
 
@@ -109,10 +263,74 @@ def add_comment(request, post_id):
         comment = form.save(commit=False)
         comment.author = request.user
         comment.post = post
-        comment.save()
+        with transaction.atomic():
+            comment.save()
     return redirect('posts:post_detail', post_id=post_id)
 
 
+# ПОИСК
+
+
+def search(request):
+    """Поиск по тексту постов."""
+    query = request.GET.get('q', '').strip()
+    context = {
+        'query': query,
+        'page_obj': search_page(request, query),
+    }
+    return render(request, 'posts/search.html', context)
+
+
+def search_api(request):
+    """Поиск по тексту постов в формате JSON."""
+    page_obj = search_page(request, request.GET.get('q', '').strip())
+    results = [
+        {
+            'id': post.pk,
+            'text': post.text,
+            'author': post.author.username,
+            'group': post.group.slug if post.group else None,
+            'pub_date': post.pub_date,
+        }
+        for post in page_obj
+    ]
+    return JsonResponse({
+        'results': results,
+        'next': getattr(page_obj, 'next_cursor', None),
+        'previous': getattr(page_obj, 'previous_cursor', None),
+    }, json_dumps_params={'ensure_ascii': False})
+
+
+# ВЫГРУЗКА
+
+
+@staff_member_required
+def export_posts(request):
+    """Потоковая выгрузка постов для аналитики и резервных копий."""
+    file_format = request.GET.get('format', 'ndjson')
+    if file_format not in FORMATS:
+        return HttpResponseBadRequest('Неизвестный формат выгрузки')
+    try:
+        lines = export_lines(
+            file_format,
+            group=request.GET.get('group'),
+            author=request.GET.get('author'),
+            since=request.GET.get('since'),
+            until=request.GET.get('until'),
+        )
+    except ValueError as error:
+        return HttpResponseBadRequest(str(error))
+    content_type = {
+        'csv': 'text/csv; charset=utf-8',
+        'ndjson': 'application/x-ndjson; charset=utf-8',
+    }[file_format]
+    response = StreamingHttpResponse(lines, content_type=content_type)
+    response['Content-Disposition'] = (
+        f'attachment; filename="posts.{file_format}"'
+    )
+    return response
+
+
 # ПОДПИСКА-ОТПИСКА
 
 
@@ -120,8 +338,7 @@ def add_comment(request, post_id):
 def follow_index(request):
     # информация о текущем пользователе доступна в переменной request.user
     title = "Страница постов с подписками"
-    posts = Post.objects.filter(author__following__user=request.user)
-    page_obj = paginate_page(request, posts)
+    page_obj = follow_feed_page(request)
     context = {
         'title': title,
         'page_obj': page_obj,
@@ -136,7 +353,8 @@ def profile_follow(request, username):
         author=author, user=request.user
     ).exists()
     if not check_follow and request.user != author:
-        request.user.follower.create(author=author)
+        with transaction.atomic():
+            request.user.follower.create(author=author)
     return redirect('posts:follow_index')
 
 @login_required
@@ -147,5 +365,6 @@ def profile_unfollow(request, username):
         author=author.id,
         user=request.user.id
     )
-    follow.delete()
+    with transaction.atomic():
+        follow.delete()
     return redirect('posts:profile', username=username)
@@ -51,6 +51,8 @@ INSTALLED_APPS = [
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'core.middleware.QueryCountMiddleware',
+    'core.middleware.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -89,7 +91,45 @@ DATABASES = {
     'default': {
         'ENGINE': 'django.db.backends.sqlite3',
         'NAME': os.path.join(BASE_DIR, 'db.sqlite3'),
-    }
+        # Соединение живёт между запросами воркера, а не открывается
+        # заново (вместе с PRAGMA) на каждый запрос.
+        'CONN_MAX_AGE': 600,
+    },
+    # Реплики только для чтения (core.routers). Локально их роль
+    # играют копии файла базы, которые обновляет manage.py
+    # sync_replicas; в тестах они зеркалят default.
+    'replica1': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.replica1.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'TEST': {'MIRROR': 'default'},
+    },
+    'replica2': {
+        'ENGINE': 'django.db.backends.sqlite3',
+        'NAME': os.path.join(BASE_DIR, 'db.replica2.sqlite3'),
+        'CONN_MAX_AGE': 600,
+        'TEST': {'MIRROR': 'default'},
+    },
+}
+DATABASE_ROUTERS = ['core.routers.ReplicaRouter']
+# Алиасы, с которых читают страницы; пустой список - всё из default.
+DATABASE_REPLICAS = []
+# После записи чтения пользователя столько секунд идут в default.
+REPLICA_PIN_SECONDS = 10
+REPLICA_PIN_COOKIE = 'pin_primary'
+
+# Выполняются на каждом новом соединении SQLite (core.db).
+# WAL позволяет читателям не ждать писателя и наоборот; при WAL
+# synchronous=NORMAL надёжен и не делает fsync на каждой транзакции.
+# busy_timeout - сколько ждать блокировку записи вместо ошибки
+# «database is locked».
+SQLITE_PRAGMAS = {
+    'journal_mode': 'wal',
+    'synchronous': 'normal',
+    'busy_timeout': 5000,
+    'cache_size': -64 * 1024,  # в КБ: 64 МБ страниц на соединение
+    'mmap_size': 256 * 1024 * 1024,
+    'temp_store': 'memory',
 }
 
 
@@ -133,6 +173,17 @@ STATICFILES_DIRS = [os.path.join(BASE_DIR, 'static')]
 STATIC_URL = '/static/'
 
 POSTS_PER_PAGE: int = 10
+COMMENTS_PER_PAGE: int = 20
+FEED_ITEMS: int = 20
+
+# Лента подписок: сколько постов автора кладётся в ленту при подписке
+# (более старые посты автора ленте не видны - они есть в профиле),
+# с какого числа подписчиков посты автора перестают раздаваться при
+# записи и ниже какого раздача возобновляется. Между порогами режим
+# автора не меняется, чтобы он не переключался на каждой подписке.
+FEED_BACKFILL_SIZE: int = 200
+FEED_FANOUT_LIMIT: int = 1000
+FEED_FANOUT_RESUME: int = 800
 
 DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
@@ -150,10 +201,93 @@ CSRF_FAILURE_VIEW = 'core.views.csrf_failure'
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
+# Варианты картинок постов строятся при сохранении формы в пуле
+# потоков (posts.thumbnails); 0 - строить сразу в запросе.
+# Каждая ширина сохраняется в WebP и в исходном формате.
+THUMBNAIL_WORKERS: int = 2
+POST_IMAGE_SIZE = (960, 339)
+POST_IMAGE_WIDTHS = (320, 640, 960)
+
+# LocMemCache у каждого процесса свой: при нескольких воркерах
+# фрагменты строятся и хранятся по разу в каждом. Общий кеш
+# (core.sqlite_cache) - файл SQLite в режиме WAL без отдельного
+# сервиса; при истечении популярного ключа его пересобирает один
+# процесс, остальные GRACE секунд получают прежнее значение.
+# В отладке и тестах кеш остаётся в памяти: файл переживал бы
+# перезапуск и отдавал фрагменты от прошлой тестовой базы.
+SHARED_CACHE = {
+    'BACKEND': 'core.sqlite_cache.SQLiteCache',
+    'LOCATION': os.path.join(BASE_DIR, 'cache', 'cache.sqlite3'),
+    'OPTIONS': {
+        'MAX_ENTRIES': 100_000,
+        'GRACE': 60,
+        'LOCK_TIMEOUT': 30,
+    },
+}
+
 CACHES = {
-    'default': {
+    'default': SHARED_CACHE if not DEBUG else {
         'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
     }
 }
 
-CACHES_TIME = 20
+# Фрагменты списков сбрасываются сигналами (posts.cache), поэтому
+# время жизни ограничивает только объём кеша, а не свежесть страниц.
+CACHES_TIME = 60 * 60 * 6
+
+# Шапка профиля (счётчики и кнопка подписки) кешируется отдельно по
+# автору и состоянию подписки; 0 - собирать её на каждый запрос.
+PROFILE_HEADER_CACHE_TIME: int = CACHES_TIME
+
+# Сколько последних постов автора держать в кеше ленты
+# (posts.timeline): первые страницы профиля читаются по pk.
+PROFILE_TIMELINE_SIZE: int = 100
+
+# Учёт SQL-запросов (core.middleware.QueryCountMiddleware): число,
+# время и повторы пишутся в лог yatube.queries (уровень INFO) и
+# в заголовок Server-Timing. Бюджет - наибольшее число запросов
+# страницы авторизованного пользователя при холодном кеше. Ключ без
+# метода - бюджет GET и HEAD, у записи свой ключ ('POST <имя>'); тесты
+# posts/tests/test_budgets.py включают QUERY_BUDGET_STRICT.
+QUERY_TIMING_HEADER = DEBUG
+QUERY_BUDGET_STRICT = False
+QUERY_BUDGETS = {
+    'posts:index': 4,
+    'posts:group_list': 5,
+    'posts:profile': 6,
+    'posts:post_detail': 6,
+    'posts:post_comments': 2,
+    'posts:post_create': 3,
+    'posts:post_edit': 4,
+    # Запись со счётчиками идёт в transaction.atomic: в тестах это
+    # SAVEPOINT и RELEASE.
+    'POST posts:post_create': 14,
+    'POST posts:post_edit': 10,
+    'posts:follow_index': 5,
+    'posts:search': 4,
+    'posts:search_api': 2,
+    'posts:index_rss': 1,
+    'posts:index_atom': 1,
+    'posts:group_rss': 3,
+    'posts:group_atom': 3,
+    'posts:profile_rss': 3,
+    'posts:profile_atom': 3,
+    'posts:api_index': 2,
+    'posts:api_group_list': 3,
+    'posts:api_profile': 3,
+    'posts:api_post_detail': 2,
+    'posts:api_post_comments': 2,
+    'posts:api_follow_index': 5,
+}
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        # INFO - строка на каждый запрос, WARNING - только превышения.
+        'yatube.queries': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}